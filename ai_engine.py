@@ -0,0 +1,115 @@
+import streamlit as st
+import logging
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from ai_scheduler import HedgedScheduler
+from llm_clients import ClientPool
+from metrics import REGISTRY
+from vault_cache import is_complete_vault
+
+# ==========================================
+# 🤖 AI 邏輯與多雲端調度
+# ==========================================
+def _secret(name):
+    # 每把金鑰各自查找：環境變數優先；Streamlit 之外沒有 secrets.toml 時 st.secrets 會拋例外，只讓這一把視為未設定
+    value = os.getenv(name)
+    if value: return value
+    try: return st.secrets.get(name)
+    except Exception: return None
+
+GEMINI_API_KEY = _secret("GEMINI_API_KEY")
+GROQ_API_KEY = _secret("GROQ_API_KEY")
+GROK_API_KEY = _secret("GROK_API_KEY")
+
+# 🚀 用戶端在第一次呼叫 AI 時才建立 (同時才匯入 Google / OpenAI SDK)，整個行程共用
+CLIENT_POOL = ClientPool({"gemini": GEMINI_API_KEY, "groq": GROQ_API_KEY, "grok": GROK_API_KEY})
+
+def _gemini_provider(model):
+    return lambda prompt: CLIENT_POOL.get("gemini").models.generate_content(model=model, contents=prompt).text
+
+def _openai_provider(provider, model):
+    return lambda prompt: CLIENT_POOL.get(provider).chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        response_format={"type": "json_object"}
+    ).choices[0].message.content
+
+def build_providers():
+    # 依優先序排列：Gemini 三個模型 → Groq → Grok
+    providers = []
+    if CLIENT_POOL.configured("gemini"):
+        for model in ["gemini-3.0-flash", "gemini-2.5-flash-lite", "gemini-2.5-flash"]:
+            providers.append((f"Google {model}", _gemini_provider(model)))
+    if CLIENT_POOL.configured("groq"): providers.append(("Groq Llama-3.3", _openai_provider("groq", "llama-3.3-70b-versatile")))
+    if CLIENT_POOL.configured("grok"): providers.append(("xAI Grok-2", _openai_provider("grok", "grok-2-latest")))
+    return providers
+
+AI_CALL_TIMEOUT = 90       # 秒；單次 call_ai_with_fallback (含對沖) 的整體期限
+VAULT_WORKERS = 4          # 同時生成劇本的性格數
+# 劇本生成執行緒各自可能對全部供應商對沖，再留一份給介面上的連線測試
+AI_SCHEDULER = HedgedScheduler(build_providers(), concurrent_calls=VAULT_WORKERS + 1)
+
+def extract_json(raw):
+    if "```json" in raw: raw = raw.split("```json")[1].split("```")[0].strip()
+    elif "```" in raw: raw = raw.split("```")[1].strip()
+    return json.loads(raw)
+
+def is_valid_json(raw):
+    try: extract_json(raw); return True
+    except ValueError: return False
+
+def call_ai_with_fallback(prompt: str, timeout: float = AI_CALL_TIMEOUT) -> tuple:
+    # 健康度感知 + 對沖調度：最先回傳合法 JSON 的供應商勝出；超過 timeout 秒仍無結果即拋出 RuntimeError
+    return AI_SCHEDULER.call(prompt, validate=is_valid_json, timeout=timeout)
+
+VAULT_RETRIES = 2          # 單一性格 JSON 解析失敗時的重試次數
+VAULT_POOL = ThreadPoolExecutor(max_workers=VAULT_WORKERS, thread_name_prefix="vault")
+VAULT_PARSE_FAILURES = REGISTRY.counter("vault_parse_failures_total", "劇本 JSON 解析失敗或欄位不完整的次數")
+
+def generate_personality_vault(personality, retries=VAULT_RETRIES):
+    # 🚀 每個性格獨立一個小 prompt：可平行生成，且某個性格解析失敗時只重試它自己
+    prompt = f"""你是頂尖的三國遊戲編劇。請為 AI 性格 {personality} 撰寫專屬台詞。
+    情境包含 6 種屬性（武力, 智力, 統帥, 政治, 魅力, 運氣），每種屬性下有 4 種名次反應(1, 2, 3, 4)。
+    第 1 名要極度囂張，第 4 名要崩潰哀嚎。每句台詞 15-35 字。
+    
+    【極度重要】請務必嚴格輸出為 JSON 格式，且「鍵值名稱」必須與以下範例完全一致（包含括號）：
+    {{
+        "{personality}": {{
+            "武力": {{"1": "台詞...", "2": "台詞...", "3": "台詞...", "4": "台詞..."}},
+            "智力": {{"1": "台詞...", "2": "台詞...", "3": "台詞...", "4": "台詞..."}},
+            "統帥": {{"1": "台詞...", "2": "台詞...", "3": "台詞...", "4": "台詞..."}},
+            "政治": {{"1": "台詞...", "2": "台詞...", "3": "台詞...", "4": "台詞..."}},
+            "魅力": {{"1": "台詞...", "2": "台詞...", "3": "台詞...", "4": "台詞..."}},
+            "運氣": {{"1": "台詞...", "2": "台詞...", "3": "台詞...", "4": "台詞..."}}
+        }}
+    }}
+    """
+    if not AI_SCHEDULER.providers:
+        logging.error(f"劇本生成略過 ({personality}): 未設定任何 AI 供應商")
+        return {}
+    for attempt in range(retries + 1):
+        try:
+            raw, _ = call_ai_with_fallback(prompt)
+            data = extract_json(raw)
+            # 模型偶爾省略外層性格鍵，直接回傳六屬性內容
+            vault = data if personality in data else {personality: data}
+            if is_complete_vault(vault, [personality]): return {personality: vault[personality]}
+            raise ValueError("台詞欄位不完整")
+        except Exception as e:
+            # ValueError 為 JSON 解析失敗或欄位不完整；其餘 (例如所有供應商失敗) 已由調度器計入
+            if isinstance(e, ValueError): VAULT_PARSE_FAILURES.inc(personality=personality)
+            logging.error(f"劇本生成解析失敗 ({personality} 第 {attempt + 1} 次): {e}")
+    return {}
+
+def start_vault_generation(personalities, on_ready, cache=None):
+    # 背景平行生成：每個性格完成後立刻呼叫 on_ready(部分劇本)，呼叫端不需等待
+    def job(p):
+        try:
+            vault = cache.get_or_generate([p], lambda ps: generate_personality_vault(ps[0])) if cache else generate_personality_vault(p)
+            if vault: on_ready(vault)
+            return vault
+        except Exception as e:
+            logging.error(f"劇本背景生成失敗 ({p}): {e}")
+            return {}
+    return [VAULT_POOL.submit(job, p) for p in personalities]
@@ -0,0 +1,163 @@
+"""多雲端 AI 供應商調度器：健康度追蹤、斷路器與對沖 (hedged) 請求。
+
+每個供應商/模型記錄最近的延遲與成敗；連續失敗或錯誤率過高時斷路一段時間。
+請求依優先序送出，若目前的供應商超過其 p90 延遲仍未回應，就再對下一個供應商送出對沖請求，
+最先回傳且通過驗證的結果勝出。供應商只是 `prompt -> str` 的函式，測試時可直接換成本地假供應商。
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import REGISTRY
+
+WINDOW = 50                 # 滾動統計的樣本數
+MIN_SAMPLES = 5             # 樣本數不足時使用預設對沖延遲
+DEFAULT_HEDGE_DELAY = 4.0   # 秒
+MIN_HEDGE_DELAY, MAX_HEDGE_DELAY = 0.5, 15.0
+FAILURE_THRESHOLD = 3       # 連續失敗幾次即斷路
+ERROR_RATE_THRESHOLD = 0.5
+COOLDOWN = 30.0             # 斷路後多久進入半開狀態，放行一次試探請求
+CONCURRENT_CALLS = 5        # 預期同時進行的 call() 數；執行緒池大小 = 此值 × 供應商數
+
+ATTEMPT_SECONDS = REGISTRY.histogram("ai_attempt_seconds", "每次供應商/模型呼叫的耗時 (outcome: ok/error/empty/invalid)")
+ATTEMPT_FAILURES = REGISTRY.counter("ai_attempt_failures_total", "供應商/模型呼叫失敗次數 (reason: error/empty/invalid)")
+FALLBACK_DEPTH = REGISTRY.histogram("ai_fallback_depth", "每次 call() 送出的供應商數 (1 = 首選即成功)", buckets=(1, 2, 3, 4, 5, 6, 8))
+
+class ProviderHealth:
+    def __init__(self, window=WINDOW):
+        self._samples = deque(maxlen=window)   # (latency, ok)
+        self._lock = threading.Lock()
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.half_open_probe = False
+
+    def record(self, latency, ok):
+        with self._lock:
+            self._samples.append((latency, ok))
+            self.half_open_probe = False
+            if ok:
+                self.consecutive_failures = 0
+                self.open_until = 0.0
+                return
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= FAILURE_THRESHOLD or (len(self._samples) >= MIN_SAMPLES and self._error_rate() > ERROR_RATE_THRESHOLD):
+                self.open_until = time.monotonic() + COOLDOWN
+
+    def available(self):
+        # 斷路中回傳 False；冷卻結束後只放行一個試探請求 (半開)
+        with self._lock:
+            if self.open_until == 0.0: return True
+            return time.monotonic() >= self.open_until and not self.half_open_probe
+
+    def begin(self):
+        with self._lock:
+            if self.open_until and time.monotonic() >= self.open_until: self.half_open_probe = True
+
+    def _error_rate(self):
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples) if self._samples else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            lat = sorted(l for l, ok in self._samples if ok)
+            return {
+                "samples": len(self._samples),
+                "error_rate": self._error_rate(),
+                "p50": lat[len(lat) // 2] if lat else None,
+                "p90": lat[min(int(len(lat) * 0.9), len(lat) - 1)] if lat else None,
+                "circuit_open": time.monotonic() < self.open_until,
+            }
+
+    def hedge_delay(self):
+        snap = self.snapshot()
+        p90 = snap["p90"]
+        if p90 is None or snap["samples"] < MIN_SAMPLES: return DEFAULT_HEDGE_DELAY
+        return min(max(p90, MIN_HEDGE_DELAY), MAX_HEDGE_DELAY)
+
+class HedgedScheduler:
+    def __init__(self, providers, concurrent_calls=CONCURRENT_CALLS):
+        # providers: [(名稱, prompt -> str), ...]，依優先序排列
+        # 每個 call() 最多同時對全部供應商送出請求；執行緒池依此配置，對沖請求不會排在卡住的請求後面
+        self.providers = list(providers)
+        self.health = {name: ProviderHealth() for name, _ in self.providers}
+        self._pool = ThreadPoolExecutor(max_workers=concurrent_calls * max(len(self.providers), 1), thread_name_prefix="ai-hedge")
+
+    def call(self, prompt, validate=None, timeout=None):
+        """回傳 (文字, 供應商名稱)。validate(text) 為假或拋例外時視為該供應商失敗並改用下一個。
+
+        timeout 為整體期限 (秒)，到期仍無結果即拋出 RuntimeError。結束時取消還在排隊的請求；
+        已在執行的請求無法中斷，由用戶端本身的請求逾時 (llm_clients.REQUEST_TIMEOUT) 收尾。
+        """
+        ready = [(n, f) for n, f in self.providers if self.health[n].available()]
+        # 全部斷路時仍依序嘗試，避免完全無法服務
+        queue = deque(ready or self.providers)
+        if not queue: raise RuntimeError("所有 AI 服務暫不可用: 未設定任何供應商")
+
+        deadline = time.monotonic() + timeout if timeout else None
+        pending, attempts, last_error = {}, [], None
+
+        def launch():
+            name, fn = queue.popleft()
+            self.health[name].begin()
+            attempt = {"name": name, "delay": self.health[name].hedge_delay(), "started": None}
+            attempts.append(attempt)
+            pending[self._pool.submit(self._attempt, name, fn, prompt, validate, attempt)] = name
+
+        launch()
+        try:
+            while pending:
+                latest = attempts[-1]
+                wait_for = None
+                if queue:
+                    # 對沖延遲從請求真正開始執行時起算；還在排隊時先等一個完整延遲再檢查
+                    started = latest["started"]
+                    wait_for = latest["delay"] if started is None else max(0.0, started + latest["delay"] - time.monotonic())
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0: break
+                    wait_for = remaining if wait_for is None else min(wait_for, remaining)
+                done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+                if not done:
+                    started = latest["started"]
+                    if queue and started is not None and time.monotonic() - started >= latest["delay"]:
+                        logging.info(f"AI 對沖：{latest['name']} 超過 {latest['delay']:.1f}s 未回應，追加 {queue[0][0]}")
+                        launch()
+                    continue
+                for fut in done:
+                    name = pending.pop(fut)
+                    try:
+                        text = fut.result()
+                        FALLBACK_DEPTH.observe(len(attempts), outcome="ok")
+                        return text, name
+                    except Exception as e:
+                        last_error = e
+                        logging.warning(f"AI 供應商 {name} 失敗: {e}")
+                if queue: launch()
+            FALLBACK_DEPTH.observe(len(attempts), outcome="failed")
+            raise RuntimeError(f"所有 AI 服務暫不可用: {last_error or '等待逾時'}")
+        finally:
+            for fut in pending: fut.cancel()
+
+    def _attempt(self, name, fn, prompt, validate, attempt=None):
+        if attempt is not None: attempt["started"] = time.monotonic()
+        t0, reason = time.perf_counter(), "error"
+        try:
+            text = fn(prompt)
+            reason = "empty"
+            if not text: raise ValueError("空白回應")
+            reason = "invalid"
+            if validate is not None and not validate(text): raise ValueError("回應格式不符")
+        except Exception:
+            latency = time.perf_counter() - t0
+            self.health[name].record(latency, False)
+            ATTEMPT_SECONDS.observe(latency, provider=name, outcome=reason)
+            ATTEMPT_FAILURES.inc(provider=name, reason=reason)
+            raise
+        latency = time.perf_counter() - t0
+        self.health[name].record(latency, True)
+        ATTEMPT_SECONDS.observe(latency, provider=name, outcome="ok")
+        return text
+
+    def health_report(self):
+        return {name: self.health[name].snapshot() for name, _ in self.providers}
@@ -0,0 +1,108 @@
+"""AI 頭像資源層：啟動時一次載入 avatars/*.png，縮小到結果頁欄寬後以 bytes 常駐記憶體。
+
+每次重繪都把同一份 bytes 交給 st.image；Streamlit 以內容雜湊產生媒體網址，網址不變，瀏覽器可直接沿用快取。
+量測縮圖前後的傳輸量與讀取耗時：
+
+    python avatar_cache.py
+"""
+import io
+import logging
+import os
+import time
+from collections import namedtuple
+
+from PIL import Image
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+AVATAR_FILES = {
+    "【神算子】": {1: "avatars/strategist_1.png", 2: "avatars/strategist_2.png", 3: "avatars/strategist_3.png", 4: "avatars/strategist_4.png"},
+    "【霸道梟雄】": {1: "avatars/warlord_1.png", 2: "avatars/warlord_2.png", 3: "avatars/warlord_3.png", 4: "avatars/warlord_4.png"},
+    "【守護之盾】": {1: "avatars/shield_1.png", 2: "avatars/shield_2.png", 3: "avatars/shield_3.png", 4: "avatars/shield_4.png"}
+}
+
+# 結果頁 st.columns([1, 6]) 的頭像欄約 96px 寬，以 2 倍解析度輸出以兼顧高 DPI 螢幕
+AVATAR_DISPLAY_WIDTH = 96
+AVATAR_PIXEL_WIDTH = AVATAR_DISPLAY_WIDTH * 2
+FALLBACK_EMOJI = "🎭"
+
+Avatar = namedtuple("Avatar", ["data", "width", "height", "source_bytes"])
+
+def load_avatar(path, width=AVATAR_PIXEL_WIDTH):
+    with open(path, "rb") as f: raw = f.read()
+    with Image.open(io.BytesIO(raw)) as img:
+        if img.width > width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        # 縮圖後轉為 256 色調色盤 PNG (保留透明度)，體積約為全彩的五分之一
+        img = img.convert("RGBA").quantize(256, method=Image.Quantize.FASTOCTREE)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG", optimize=True)
+        w, h = img.size
+    data = buf.getvalue()
+    return Avatar(data, w, h, len(raw))
+
+class AvatarCache:
+    def __init__(self, files=AVATAR_FILES, width=AVATAR_PIXEL_WIDTH, base_dir=BASE_DIR):
+        self._avatars = {}
+        for pers, ranks in files.items():
+            for rank, rel in ranks.items():
+                path = os.path.join(base_dir, rel)
+                try:
+                    self._avatars[(pers, rank)] = load_avatar(path, width)
+                except (OSError, ValueError) as e:
+                    # 缺檔或壞檔時不中斷啟動，畫面改用表情符號
+                    logging.warning(f"頭像載入失敗 {rel}: {e}")
+
+    def get(self, personality, rank):
+        return self._avatars.get((personality, rank))
+
+    def __len__(self):
+        return len(self._avatars)
+
+    def summary(self):
+        return {"count": len(self._avatars),
+                "source_bytes": sum(a.source_bytes for a in self._avatars.values()),
+                "cached_bytes": sum(len(a.data) for a in self._avatars.values())}
+
+def main():
+    # 舊作法：每次重繪 os.path.exists + 讀取整張原圖送給每個用戶端
+    paths = [os.path.join(BASE_DIR, rel) for ranks in AVATAR_FILES.values() for rel in ranks.values()]
+    reps = 200
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        for p in paths:
+            if os.path.exists(p):
+                with open(p, "rb") as f: f.read()
+    before = (time.perf_counter() - t0) / reps
+
+    t0 = time.perf_counter()
+    cache = AvatarCache()
+    load_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        for pers, ranks in AVATAR_FILES.items():
+            for rank in ranks: cache.get(pers, rank)
+    after = (time.perf_counter() - t0) / reps
+
+    # 重繪時 st.image 與瀏覽器都要解碼整張圖，以 PIL 解碼時間近似每次重繪的圖片處理成本
+    def decode_all(blobs):
+        t0 = time.perf_counter()
+        for b in blobs:
+            with Image.open(io.BytesIO(b)) as img: img.load()
+        return time.perf_counter() - t0
+    originals = []
+    for p in paths:
+        with open(p, "rb") as f: originals.append(f.read())
+    decode_before = decode_all(originals)
+    decode_after = decode_all([a.data for a in cache._avatars.values()])
+
+    s = cache.summary()
+    print(f"🖼️ {s['count']} 張頭像，啟動載入 + 縮圖 {load_time * 1000:.0f} ms")
+    print(f"   傳輸量：原圖 {s['source_bytes'] / 1024:,.0f} KiB → 縮圖 {s['cached_bytes'] / 1024:,.0f} KiB "
+          f"({s['cached_bytes'] / s['source_bytes']:.1%})")
+    print(f"   每次重繪取得 12 張：磁碟讀取 {before * 1e6:,.0f} µs → 記憶體查詢 {after * 1e6:,.1f} µs")
+    print(f"   每次重繪解碼 12 張：原圖 {decode_before * 1000:.1f} ms → 縮圖 {decode_after * 1000:.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,137 @@
+"""遊戲引擎壓測：先同時開好上千個房間，再由多個執行緒交錯推進各房間的狀態轉換，
+回報吞吐量、轉換延遲與每個進行中房間的記憶體。
+
+    python benchmark.py --rooms 2000 --threads 32
+    python benchmark.py --rooms 500 --threads 8 --backend sqlite
+    python benchmark.py --ai lookahead
+"""
+import argparse
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from engine import AI_PICKERS, CARDS_PER_ROUND, GameEngine, make_ai_picker
+from game_rules import VALID_FACTIONS, TOTAL_ROUNDS
+from room_store import BACKENDS, create_room_store
+
+OPS = ("create_room", "join", "start", "lock_cards", "resolve", "next_round")
+
+def _timed(engine, timings, op, *args):
+    t0 = time.perf_counter()
+    result = getattr(engine, op)(*args)
+    timings[op].append(time.perf_counter() - t0)
+    return result
+
+def open_room(engine, rng, timings):
+    """建房、1~4 位真人玩家入座並開局；回傳 [(code, pid), ...]，每位真人玩家一項。"""
+    code = _timed(engine, timings, "create_room")
+    humans = rng.randint(1, len(VALID_FACTIONS))
+    pids = [f"bench_{rng.getrandbits(32):08x}" for _ in range(humans)]
+    for pid, faction in zip(pids, rng.sample(VALID_FACTIONS, humans)): _timed(engine, timings, "join", code, pid, faction)
+    _timed(engine, timings, "start", code, pids[0])
+    return [(code, pid) for pid in pids]
+
+def step(engine, rng, code, pid, timings):
+    """替玩家 pid 在房間 code 做下一個動作 (如同真人在畫面上按鈕)；回傳 False 表示該房已結束。
+
+    同房的多位玩家可能同時按下「結算」或「下一回合」，引擎只接受其中一次，其餘回傳 False，正好量到鎖競爭。
+    """
+    room = engine.get(code)
+    if room is None: raise RuntimeError(f"房間 {code} 遺失")
+    status = room["status"]
+    if status == "finished": return False
+    if status == "playing":
+        if pid not in room["locked_cards"]:
+            _timed(engine, timings, "lock_cards", code, pid, rng.sample(room["decks"][pid], CARDS_PER_ROUND))
+    elif status == "resolution_pending": _timed(engine, timings, "resolve", code)
+    elif status == "resolution_result": _timed(engine, timings, "next_round", code)
+    return True
+
+def run(rooms=1000, threads=16, backend="memory", seed=0, ai="greedy"):
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.sqlite3") if backend == "sqlite" else None
+    store = create_room_store(backend, db_path=db_path, reap_interval=0)
+    # 與線上相同：選將策略在開始計時前建立 (lookahead 會先預熱)，壓測只量穩態
+    engine = GameEngine(store, rng=random.Random(seed), ai_picker=make_ai_picker(ai))
+    per_thread = [{op: [] for op in OPS} for _ in range(threads)]
+    players, players_lock = [], threading.Lock()
+    work, errors = queue.Queue(), []
+    opened = threading.Barrier(threads)
+
+    def worker(w):
+        rng = random.Random(seed * 1000 + w)
+        try:
+            # 第一階段：所有房間同時開局，之後每個房間都處於進行中
+            mine = [p for _ in range(w, rooms, threads) for p in open_room(engine, rng, per_thread[w])]
+            with players_lock: players.extend(mine)
+            opened.wait()
+            if w == 0:
+                random.Random(seed).shuffle(players)
+                for p in players: work.put(p)
+            opened.wait()
+            # 第二階段：各執行緒從共用佇列輪流取出 (房間, 玩家)，做一步後放回隊尾，所有房間交錯推進
+            while True:
+                try: code, pid = work.get_nowait()
+                except queue.Empty: return
+                if step(engine, rng, code, pid, per_thread[w]): work.put((code, pid))
+        except Exception as e:
+            errors.append(e)
+            opened.abort()
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(w,)) for w in range(threads)]
+    for t in pool: t.start()
+    for t in pool: t.join()
+    elapsed = time.perf_counter() - t0
+    if errors: raise errors[0]
+    unfinished = [c for c, _ in players if engine.get(c)["status"] != "finished"]
+    if unfinished: raise RuntimeError(f"{len(set(unfinished))} 個房間未正常結束")
+
+    stats = {}
+    for op in OPS:
+        lat = np.array([x for t in per_thread for x in t[op]]) * 1000
+        stats[op] = {"count": lat.size, "p50_ms": float(np.percentile(lat, 50)), "p99_ms": float(np.percentile(lat, 99))}
+    total_ops = sum(s["count"] for s in stats.values())
+    return {"rooms": rooms, "threads": threads, "backend": backend, "ai": ai, "elapsed": elapsed,
+            "ops_per_sec": total_ops / elapsed, "games_per_sec": rooms / elapsed, "ops": stats,
+            "bytes_per_room": memory_per_room(backend)}
+
+def memory_per_room(backend, rooms=500, seed=0):
+    """以 tracemalloc 量測同時進行中 (已開局、首回合已鎖牌) 的每個房間佔用的記憶體 (SQLite 後端狀態在磁碟上，僅計算行程內開銷)。"""
+    db_path = os.path.join(tempfile.mkdtemp(), "mem.sqlite3") if backend == "sqlite" else None
+    store = create_room_store(backend, db_path=db_path, reap_interval=0)
+    engine = GameEngine(store, rng=random.Random(seed))
+    rng, timings = random.Random(seed), {op: [] for op in OPS}
+    for code, pid in open_room(engine, rng, timings): step(engine, rng, code, pid, timings)   # 先暖機，排除模組層級的一次性配置
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    live = [p for _ in range(rooms) for p in open_room(engine, rng, timings)]
+    for code, pid in live: step(engine, rng, code, pid, timings)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del timings
+    return sum(s.size_diff for s in after.compare_to(before, "filename")) / rooms
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="三國之巔 遊戲引擎壓測")
+    ap.add_argument("--rooms", type=int, default=2000)
+    ap.add_argument("--threads", type=int, default=32)
+    ap.add_argument("--backend", choices=BACKENDS, default="memory")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--ai", choices=AI_PICKERS, default="greedy", help="AI 選將法")
+    args = ap.parse_args(argv)
+
+    r = run(args.rooms, args.threads, args.backend, args.seed, args.ai)
+    print(f"⚔️ {r['rooms']} 房同時進行 × {TOTAL_ROUNDS} 回合｜{r['threads']} 執行緒｜後端 {r['backend']}｜AI {r['ai']}｜{r['elapsed']:.2f} 秒")
+    print(f"   吞吐量 {r['ops_per_sec']:,.0f} ops/秒，{r['games_per_sec']:,.1f} 局/秒，每房記憶體 ≈ {r['bytes_per_room'] / 1024:.1f} KiB")
+    print(f"   {'轉換':<12}{'次數':>8}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    for op, s in r["ops"].items(): print(f"   {op:<12}{s['count']:>8}{s['p50_ms']:>12.3f}{s['p99_ms']:>12.3f}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,154 @@
+"""三國之巔 無頭遊戲引擎：所有規則與房間狀態轉換，不依賴 Streamlit。
+
+`main.py` 的 render_lobby / render_room 只是這裡的薄客戶端；壓測 (benchmark.py) 與其他前端可直接驅動它。
+"""
+import secrets
+
+from game_rules import (
+    VALID_FACTIONS, TOTAL_ROUNDS, AI_PERSONALITIES, FACTION_ROSTERS, STAT_ATTRS, ATTR_INDEX, STATS_LOOKUP,
+    general_rows, score_round, get_ai_cards_local
+)
+from metrics import REGISTRY
+from room_store import create_room_store, new_room
+
+CARDS_PER_ROUND = 3
+RESOLVE_SECONDS = REGISTRY.histogram("resolve_round_seconds", "回合結算 (apply_round) 耗時")
+AI_PICKERS = ("greedy", "lookahead")
+
+def greedy_ai_cards(available, personality, rounds_left=None):
+    return get_ai_cards_local(available, personality)
+
+def make_ai_picker(name=None):
+    """依設定 (greedy 預設 / lookahead) 取得 AI 選將策略。
+
+    lookahead 會在這裡建立並預熱整個行程共用的規劃器 (約 1~2 秒、20 MB)，請在啟動時、任何房間鎖之外呼叫。
+    """
+    name = name or "greedy"
+    if name not in AI_PICKERS: raise ValueError(f"未知 AI 選將法: {name}")
+    if name == "greedy": return greedy_ai_cards
+    from planner import default_planner, plan_ai_cards
+    default_planner()
+    return plan_ai_cards
+
+def apply_round(room, attr):
+    col = STATS_LOOKUP[:, ATTR_INDEX[attr]]
+    totals = {pid: int(col[general_rows(cards)].sum()) for pid, cards in room["locked_cards"].items()}
+    sorted_p, pts_map, status_msg, is_defeat = score_round(totals)
+
+    ranks = {}
+    vault = room.get("dialogue_vault", {})
+    for i, (pid, tot) in enumerate(sorted_p):
+        r_num = i + 1
+        pts = pts_map.get(i, 0)
+        room["scores"][pid] += pts
+        room["decks"][pid] = [c for c in room["decks"][pid] if c not in room["locked_cards"][pid]]
+
+        is_ai = pid.startswith("AI_")
+        pers = room["ai_personalities"].get(pid, "")
+
+        # 如果因為任何原因 AI 找不到台詞，會顯示這句除錯提示，確保不再不明不白地顯示局勢變幻莫測
+        fallback_quote = f"（系統提示：{pers} 正在思考如何開嗆，請稍候...）"
+        final_quote = vault.get(pers, {}).get(attr, {}).get(str(r_num), fallback_quote) if is_ai else ""
+
+        tag = status_msg if r_num == 1 else ("💀 完敗：軍心崩潰！" if r_num == 4 and is_defeat else "")
+        ranks[pid] = {
+            "faction": room["players"].get(pid, pid.replace("AI_","")),
+            "total": tot, "pts": pts, "rank": r_num, "is_ai": is_ai,
+            "personality": pers, "quote": final_quote, "tag": tag, "cards": room["locked_cards"][pid]
+        }
+    room.update({"last_attr": attr, "results": ranks, "status": "resolution_result"})
+
+class GameEngine:
+    def __init__(self, store=None, on_start=None, rng=None, ai_picker=greedy_ai_cards):
+        # on_start(code, ai_personalities)：開局後呼叫 (例如啟動背景劇本生成)；rng 可注入以重現壓測結果
+        # ai_picker(deck, personality, rounds_left)：AI 選將策略，預設為貪婪選將；前瞻規劃請用 make_ai_picker("lookahead")
+        self.store = store if store is not None else create_room_store()
+        self.on_start = on_start
+        self.rng = rng or secrets.SystemRandom()
+        self.ai_picker = ai_picker
+
+    # ---------- 查詢 ----------
+    def get(self, code):
+        return self.store.get(code)
+
+    def version(self, code):
+        # 每次房間修改都會遞增；前端只需比對版本號即可判斷是否要重繪
+        return self.store.version(code)
+
+    def snapshot(self, code):
+        # (版本號, 房間快照)，兩者一致；依版本號快取畫面資料時必須用這組，不能分開讀取
+        return self.store.snapshot(code)
+
+    def lobby_rooms(self):
+        return self.store.lobby_rooms()
+
+    # ---------- 狀態轉換 (皆為原子操作；房間不在預期狀態時回傳 False / None) ----------
+    def create_room(self):
+        return self.store.create(new_room())
+
+    def join(self, code, pid, faction):
+        if faction not in VALID_FACTIONS: raise ValueError(f"未知陣營: {faction}")
+        def pick_faction(room):
+            if faction in room["players"].values(): return False
+            room["players"][pid] = faction
+            return True
+        return bool(self.store.update(code, pick_faction, "lobby"))
+
+    def start(self, code, pid):
+        def start_game(room):
+            if pid not in room["players"]: return None
+            taken_f = list(room["players"].values())
+            room["ai_factions"] = [f for f in VALID_FACTIONS if f not in taken_f]
+            for p_id, faction in room["players"].items():
+                room["decks"][p_id], room["scores"][p_id] = list(FACTION_ROSTERS.get(faction, [])), 0
+            pers_pool = list(AI_PERSONALITIES.keys()); self.rng.shuffle(pers_pool)
+            ai_pers = []
+            for af in room["ai_factions"]:
+                ai_id = f"AI_{af}"
+                p_name = pers_pool.pop()
+                room["ai_personalities"][ai_id], room["decks"][ai_id], room["scores"][ai_id] = p_name, list(FACTION_ROSTERS.get(af, [])), 0
+                ai_pers.append(p_name)
+            room["dialogue_vault"] = {}
+            room["status"] = "playing"
+            return ai_pers
+        ai_pers = self.store.update(code, start_game, "lobby")
+        if ai_pers is None: return False
+        if self.on_start: self.on_start(code, ai_pers)
+        return True
+
+    def merge_dialogue(self, code, part):
+        self.store.update(code, lambda room: room["dialogue_vault"].update(part))
+
+    def lock_cards(self, code, pid, names):
+        names = list(names)
+        if len(names) != CARDS_PER_ROUND: raise ValueError(f"⚠️ 只能選擇 {CARDS_PER_ROUND} 名武將！")
+        if len(set(names)) != CARDS_PER_ROUND: raise ValueError("⚠️ 同一名武將不能重複出戰！")
+        def lock_in(room):
+            if pid in room["locked_cards"] or pid not in room["decks"]: return False
+            if not set(names) <= set(room["decks"][pid]): raise ValueError("⚠️ 只能派出自己牌組中的武將！")
+            room["locked_cards"][pid] = names
+            # 所有真人玩家都鎖定後，AI 才依當下牌組選將
+            if all(p in room["locked_cards"] for p in room["players"]):
+                rounds_left = TOTAL_ROUNDS - room["round"] + 1
+                for af in room["ai_factions"]:
+                    ai_id = f"AI_{af}"
+                    room["locked_cards"][ai_id] = self.ai_picker(room["decks"][ai_id], room["ai_personalities"][ai_id], rounds_left)
+            if len(room["locked_cards"]) == len(VALID_FACTIONS): room["status"] = "resolution_pending"
+            return True
+        return bool(self.store.update(code, lock_in, "playing"))
+
+    def resolve(self, code, attr=None):
+        # 只接受「待結算」狀態的房間，避免兩位玩家同時按下造成重複計分
+        attr = attr or self.rng.choice(STAT_ATTRS)
+        def resolve_round(room):
+            with RESOLVE_SECONDS.time(): apply_round(room, attr)
+            return True
+        return self.store.update(code, resolve_round, "resolution_pending") is not None
+
+    def next_round(self, code):
+        def advance(room):
+            room["locked_cards"] = {}
+            if room["round"] >= TOTAL_ROUNDS: room["status"] = "finished"
+            else: room["round"] += 1; room["status"] = "playing"
+            return True
+        return bool(self.store.update(code, advance, "resolution_result"))
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 📜 遊戲規則核心 (純 Python，不依賴 Streamlit，供 UI 與模擬器共用)
+# ==========================================
+VALID_FACTIONS = ["魏", "蜀", "吳", "其他"]
+TOTAL_ROUNDS = 5
+
+# ==========================================
+# 🎨 AI 性格設定
+# ==========================================
+AI_PERSONALITIES = {
+    "【神算子】": "優雅、從容。極度自信，喜歡嘲笑對手的智商低。",
+    "【霸道梟雄】": "狂傲、霸氣。充滿壓迫感，動不動就威脅要砍對手腦袋。",
+    "【守護之盾】": "謙遜、死板。滿口仁義道德，就算輸了也要說大道理。"
+}
+
+# ==========================================
+# 🗄️ 完整武將數據
+# ==========================================
+FACTION_ROSTERS = {
+    "魏": ["曹操", "張遼", "司馬懿", "夏侯惇", "郭嘉", "典韋", "許褚", "荀彧", "夏侯淵", "曹丕", "曹仁", "賈詡", "徐晃", "張郃", "龐德"],
+    "蜀": ["劉備", "關羽", "諸葛亮", "張飛", "趙雲", "馬超", "黃忠", "魏延", "龐統", "姜維", "法正", "黃月英", "馬岱", "關平", "劉禪"],
+    "吳": ["孫權", "周瑜", "太史慈", "孫策", "陸遜", "呂蒙", "甘寧", "黃蓋", "凌統", "周泰", "魯肅", "孫尚香", "大喬", "小喬", "程普"],
+    "其他": ["呂布", "張角", "董卓", "袁紹", "左慈", "陳宮", "馬騰", "貂蟬", "華佗", "孟獲", "祝融", "公孫瓚", "盧植", "皇甫嵩", "顏良"]
+}
+
+GENERALS_STATS = {
+    "曹操": {"武力": 72, "智力": 91, "統帥": 96, "政治": 94, "魅力": 96, "運氣": 85},
+    "張遼": {"武力": 92, "智力": 78, "統帥": 93, "政治": 58, "魅力": 77, "運氣": 80},
+    "司馬懿": {"武力": 63, "智力": 96, "統帥": 98, "政治": 93, "魅力": 87, "運氣": 75},
+    "夏侯惇": {"武力": 90, "智力": 60, "統帥": 85, "政治": 70, "魅力": 80, "運氣": 65},
+    "郭嘉": {"武力": 15, "智力": 98, "統帥": 80, "政治": 85, "魅力": 75, "運氣": 40},
+    "典韋": {"武力": 95, "智力": 35, "統帥": 55, "政治": 29, "魅力": 58, "運氣": 45},
+    "許褚": {"武力": 96, "智力": 36, "統帥": 65, "政治": 20, "魅力": 60, "運氣": 60},
+    "荀彧": {"武力": 14, "智力": 95, "統帥": 52, "政治": 98, "魅力": 89, "運氣": 70},
+    "夏侯淵": {"武力": 91, "智力": 55, "統帥": 84, "政治": 61, "魅力": 78, "運氣": 50},
+    "曹丕": {"武力": 71, "智力": 83, "統帥": 75, "政治": 86, "魅力": 85, "運氣": 80},
+    "曹仁": {"武力": 86, "智力": 62, "統帥": 89, "政治": 52, "魅力": 76, "運氣": 70},
+    "賈詡": {"武力": 48, "智力": 97, "統帥": 86, "政治": 85, "魅力": 53, "運氣": 88},
+    "徐晃": {"武力": 90, "智力": 74, "統帥": 88, "政治": 48, "魅力": 71, "運氣": 70},
+    "張郃": {"武力": 89, "智力": 69, "統帥": 90, "政治": 57, "魅力": 71, "運氣": 60},
+    "龐德": {"武力": 94, "智力": 68, "統帥": 80, "政治": 42, "魅力": 70, "運氣": 40},
+    "劉備": {"武力": 75, "智力": 78, "統帥": 88, "政治": 85, "魅力": 99, "運氣": 95},
+    "關羽": {"武力": 97, "智力": 75, "統帥": 95, "政治": 62, "魅力": 93, "運氣": 80},
+    "諸葛亮": {"武力": 45, "智力": 100, "統帥": 98, "政治": 98, "魅力": 95, "運氣": 85},
+    "張飛": {"武力": 98, "智力": 50, "統帥": 90, "政治": 35, "魅力": 65, "運氣": 65},
+    "趙雲": {"武力": 96, "智力": 76, "統帥": 91, "政治": 65, "魅力": 90, "運氣": 85},
+    "馬超": {"武力": 97, "智力": 52, "統帥": 91, "政治": 35, "魅力": 85, "運氣": 65},
+    "黃忠": {"武力": 93, "智力": 60, "統帥": 86, "政治": 52, "魅力": 75, "運氣": 65},
+    "魏延": {"武力": 94, "智力": 72, "統帥": 89, "政治": 50, "魅力": 55, "運氣": 50},
+    "龐統": {"武力": 34, "智力": 97, "統帥": 86, "政治": 85, "魅力": 69, "運氣": 30},
+    "姜維": {"武力": 91, "智力": 92, "統帥": 94, "政治": 80, "魅力": 85, "運氣": 65},
+    "法正": {"武力": 52, "智力": 95, "統帥": 88, "政治": 82, "魅力": 60, "運氣": 75},
+    "黃月英": {"武力": 35, "智力": 95, "統帥": 65, "政治": 88, "魅力": 75, "運氣": 70},
+    "馬岱": {"武力": 85, "智力": 62, "統帥": 80, "政治": 50, "魅力": 72, "運氣": 80},
+    "關平": {"武力": 84, "智力": 75, "統帥": 82, "政治": 65, "魅力": 80, "運氣": 70},
+    "劉禪": {"武力": 25, "智力": 45, "統帥": 35, "政治": 55, "魅力": 75, "運氣": 100},
+    "孫權": {"武力": 67, "智力": 80, "統帥": 76, "政治": 89, "魅力": 95, "運氣": 88},
+    "周瑜": {"武力": 71, "智力": 96, "統帥": 97, "政治": 86, "魅力": 93, "運氣": 75},
+    "太史慈": {"武力": 93, "智力": 66, "統帥": 82, "政治": 58, "魅力": 79, "運氣": 60},
+    "孫策": {"武力": 92, "智力": 69, "統帥": 90, "政治": 70, "魅力": 90, "運氣": 50},
+    "陸遜": {"武力": 69, "智力": 95, "統帥": 96, "政治": 87, "魅力": 85, "運氣": 80},
+    "呂蒙": {"武力": 81, "智力": 89, "統帥": 91, "政治": 78, "魅力": 82, "運氣": 70},
+    "甘寧": {"武力": 94, "智力": 76, "統帥": 86, "政治": 18, "魅力": 58, "運氣": 65},
+    "黃蓋": {"武力": 83, "智力": 65, "統帥": 79, "政治": 50, "魅力": 75, "運氣": 70},
+    "凌統": {"武力": 89, "智力": 60, "統帥": 77, "政治": 42, "魅力": 71, "運氣": 60},
+    "周泰": {"武力": 91, "智力": 48, "統帥": 76, "政治": 38, "魅力": 61, "運氣": 80},
+    "魯肅": {"武力": 43, "智力": 92, "統帥": 80, "政治": 93, "魅力": 89, "運氣": 85},
+    "孫尚香": {"武力": 86, "智力": 70, "統帥": 72, "政治": 63, "魅力": 85, "運氣": 75},
+    "大喬": {"武力": 11, "智力": 73, "統帥": 26, "政治": 60, "魅力": 92, "運氣": 60},
+    "小喬": {"武力": 12, "智力": 74, "統帥": 28, "政治": 62, "魅力": 93, "運氣": 60},
+    "程普": {"武力": 79, "智力": 74, "統帥": 84, "政治": 65, "魅力": 75, "運氣": 70},
+    "呂布": {"武力": 100, "智力": 38, "統帥": 94, "政治": 25, "魅力": 65, "運氣": 45},
+    "張角": {"武力": 35, "智力": 92, "統帥": 91, "政治": 88, "魅力": 98, "運氣": 65},
+    "董卓": {"武力": 87, "智力": 74, "統帥": 90, "政治": 68, "魅力": 45, "運氣": 50},
+    "袁紹": {"武力": 72, "智力": 82, "統帥": 93, "政治": 88, "魅力": 92, "運氣": 70},
+    "左慈": {"武力": 45, "智力": 98, "統帥": 60, "政治": 55, "魅力": 85, "運氣": 99},
+    "陳宮": {"武力": 55, "智力": 92, "統帥": 85, "政治": 83, "魅力": 72, "運氣": 50},
+    "馬騰": {"武力": 82, "智力": 65, "統帥": 84, "政治": 70, "魅力": 85, "運氣": 75},
+    "貂蟬": {"武力": 30, "智力": 85, "統帥": 45, "政治": 82, "魅力": 100, "運氣": 80},
+    "華佗": {"武力": 20, "智力": 90, "統帥": 35, "政治": 65, "魅力": 95, "運氣": 85},
+    "孟獲": {"武力": 88, "智力": 55, "統帥": 82, "政治": 58, "魅力": 80, "運氣": 75},
+    "祝融": {"武力": 87, "智力": 52, "統帥": 75, "政治": 45, "魅力": 85, "運氣": 65},
+    "公孫瓚": {"武力": 86, "智力": 68, "統帥": 86, "政治": 60, "魅力": 78, "運氣": 65},
+    "盧植": {"武力": 70, "智力": 85, "統帥": 90, "政治": 88, "魅力": 88, "運氣": 75},
+    "皇甫嵩": {"武力": 75, "智力": 78, "統帥": 95, "政治": 75, "魅力": 82, "運氣": 80},
+    "顏良": {"武力": 94, "智力": 42, "統帥": 82, "政治": 35, "魅力": 55, "運氣": 50}
+}
+
+STAT_ATTRS = ["武力", "智力", "統帥", "政治", "魅力", "運氣"]
+DEFAULT_STAT = 60
+
+def get_general_stats(n): 
+    return GENERALS_STATS.get(n, {a: DEFAULT_STAT for a in STAT_ATTRS})
+
+# ==========================================
+# 🧮 武將數據矩陣 (啟動時一次建好，熱迴圈只做向量查表)
+# ==========================================
+GENERAL_NAMES = list(GENERALS_STATS.keys())
+GENERAL_INDEX = {n: i for i, n in enumerate(GENERAL_NAMES)}
+ATTR_INDEX = {a: j for j, a in enumerate(STAT_ATTRS)}
+STATS_MATRIX = np.array([[GENERALS_STATS[n][a] for a in STAT_ATTRS] for n in GENERAL_NAMES], dtype=np.int64)
+# 最後一列為未知武將的預設值，查表時以 len(GENERAL_NAMES) 作為索引
+STATS_LOOKUP = np.vstack([STATS_MATRIX, np.full(len(STAT_ATTRS), DEFAULT_STAT, dtype=np.int64)])
+UNKNOWN_ROW = len(GENERAL_NAMES)
+
+# 各屬性由高到低的武將排行
+STAT_RANKINGS = {a: [GENERAL_NAMES[i] for i in np.argsort(-STATS_MATRIX[:, j], kind="stable")] for a, j in ATTR_INDEX.items()}
+
+# AI 性格選將權重：神算子看六維總和、梟雄看武力+統帥、守護之盾看政治+魅力+運氣
+PERSONALITY_WEIGHTS = {
+    "神算子": np.ones(len(STAT_ATTRS), dtype=np.int64),
+    "霸道梟雄": np.array([1, 0, 1, 0, 0, 0], dtype=np.int64),
+    "守護之盾": np.array([0, 0, 0, 1, 1, 1], dtype=np.int64),
+}
+PERSONALITY_SCORES = {k: STATS_LOOKUP @ w for k, w in PERSONALITY_WEIGHTS.items()}
+
+def general_rows(names):
+    return np.fromiter((GENERAL_INDEX.get(n, UNKNOWN_ROW) for n in names), dtype=np.intp, count=len(names))
+
+def personality_key(personality):
+    if "神算子" in personality: return "神算子"
+    if "霸道梟雄" in personality: return "霸道梟雄"
+    return "守護之盾"
+
+def stats_frame(names):
+    df = pd.DataFrame(STATS_LOOKUP[general_rows(names)], columns=STAT_ATTRS)
+    df.insert(0, "武將", list(names))
+    return df
+
+def get_ai_cards_local(available, personality):
+    scores = PERSONALITY_SCORES[personality_key(personality)][general_rows(available)]
+    return [available[i] for i in np.argsort(-scores, kind="stable")[:3]]
+
+
+# ==========================================
+# 🏅 回合計分規則
+# ==========================================
+# 第一名領先第二名超過 crit_margin 為爆擊，低於 narrow_margin 為險勝；
+# 第一名領先第四名超過 rout_margin 時，第四名判定完敗。
+SCORING_RULES = {
+    "base_points": (5, 3, 2, 1),
+    "crit_margin": 30, "crit_points": 8,
+    "narrow_margin": 5, "narrow_points": 4,
+    "rout_margin": 60, "rout_points": 0,
+}
+
+def score_round(totals, rules=SCORING_RULES):
+    sorted_p = sorted(totals.items(), key=lambda x: x[1], reverse=True)
+    
+    diff_1_2 = sorted_p[0][1] - sorted_p[1][1]
+    diff_1_4 = sorted_p[0][1] - sorted_p[3][1]
+    
+    pts_map = dict(enumerate(rules["base_points"]))
+    status_msg = ""
+    
+    if diff_1_2 > rules["crit_margin"]: 
+        pts_map[0] = rules["crit_points"]
+        status_msg = "💥 爆擊！碾壓獲勝！"
+    elif diff_1_2 < rules["narrow_margin"]: 
+        pts_map[0] = rules["narrow_points"]
+        status_msg = "😅 險勝：慘勝如敗..."
+        
+    is_defeat = diff_1_4 > rules["rout_margin"]
+    if is_defeat: pts_map[3] = rules["rout_points"]
+    return sorted_p, pts_map, status_msg, is_defeat
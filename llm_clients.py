@@ -0,0 +1,77 @@
+"""AI 供應商用戶端池：整個行程共用一份，第一次呼叫 AI 時才匯入 SDK 並建立用戶端。
+
+- `google.genai` 與 `openai` 匯入約需 1 秒，延後到真正需要時，冷啟動與不用 AI 的行程 (模擬器、壓測) 都不必負擔
+- 每個供應商只建立一次用戶端；Groq 與 xAI 共用同一個 httpx 連線池，keep-alive 連線可跨工作階段重用
+- `constructions` 記錄各供應商實際建立用戶端的次數，供測試確認每個行程只建立一次
+"""
+import logging
+import threading
+
+# 供應商 -> OpenAI 相容端點 (Gemini 使用自家 SDK)
+OPENAI_COMPATIBLE = {
+    "groq": "https://api.groq.com/openai/v1",
+    "grok": "https://api.xai.com/v1",
+}
+PROVIDERS = ("gemini", *OPENAI_COMPATIBLE)
+
+MAX_CONNECTIONS = 20          # 共用連線池上限 (對應排程器的並行呼叫數)
+MAX_KEEPALIVE = 10
+KEEPALIVE_EXPIRY = 60         # 秒
+REQUEST_TIMEOUT = 60          # 秒
+CONNECT_TIMEOUT = 5           # 秒
+
+class ClientPool:
+    def __init__(self, api_keys):
+        # api_keys: {"gemini": ..., "groq": ..., "grok": ...}；沒有金鑰的供應商視為未設定
+        self._keys = {p: k for p, k in api_keys.items() if p in PROVIDERS and k}
+        self._clients = {}
+        self._http = None
+        self._lock = threading.Lock()
+        self.constructions = {p: 0 for p in PROVIDERS}
+
+    def configured(self, provider):
+        return provider in self._keys
+
+    def get(self, provider):
+        client = self._clients.get(provider)
+        if client is not None: return client
+        if provider not in self._keys: raise KeyError(f"未設定 AI 供應商金鑰: {provider}")
+        with self._lock:
+            # 多個執行緒同時第一次呼叫時，只有一個會真正建立
+            client = self._clients.get(provider)
+            if client is None:
+                client = self._build(provider)
+                self._clients[provider] = client
+                self.constructions[provider] += 1
+                logging.info(f"AI 用戶端已建立: {provider}")
+        return client
+
+    def _build(self, provider):
+        key = self._keys[provider]
+        if provider == "gemini":
+            from google import genai
+            # 與 OpenAI 相容端點相同的請求逾時 (毫秒)：被對沖淘汰或卡住的請求不會無限期佔住執行緒
+            return genai.Client(api_key=key, http_options={"timeout": REQUEST_TIMEOUT * 1000})
+        from openai import OpenAI
+        return OpenAI(api_key=key, base_url=OPENAI_COMPATIBLE[provider], http_client=self._shared_http())
+
+    def _shared_http(self):
+        if self._http is None:
+            import httpx
+            self._http = httpx.Client(
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE,
+                                    keepalive_expiry=KEEPALIVE_EXPIRY),
+                timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT), follow_redirects=True)
+        return self._http
+
+    def summary(self):
+        return {p: {"configured": p in self._keys, "built": p in self._clients, "constructions": self.constructions[p]}
+                for p in PROVIDERS}
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                close = getattr(client, "close", None)
+                if close: close()
+            self._clients.clear()
+            if self._http is not None: self._http.close(); self._http = None
@@ -1,15 +1,17 @@
 import streamlit as st
-import secrets
 import html
+import json
 import logging
 import re
-import pandas as pd
-import random
-import json
 import os
-# 🚀 引入 Google 與 OpenAI(相容 Grok/Groq) SDK
-from google import genai
-from openai import OpenAI
+from game_rules import VALID_FACTIONS, TOTAL_ROUNDS
+from ai_engine import AI_SCHEDULER, CLIENT_POOL, call_ai_with_fallback, start_vault_generation
+from vault_cache import VaultCache
+from room_store import create_room_store
+from engine import GameEngine, make_ai_picker
+from avatar_cache import AvatarCache, FALLBACK_EMOJI
+from render_cache import RenderCache
+from metrics import REGISTRY
 
 # ==========================================
 # 🛡️ 系統初始化與金鑰配置
@@ -20,228 +22,66 @@ if 'current_room' not in st.session_state: st.session_state.current_room = None
 if 'player_id' not in st.session_state: st.session_state.player_id = None
 
 try:
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or st.secrets.get("GEMINI_API_KEY")
-    GROQ_API_KEY = os.getenv("GROQ_API_KEY") or st.secrets.get("GROQ_API_KEY")
-    GROK_API_KEY = os.getenv("GROK_API_KEY") or st.secrets.get("GROK_API_KEY")
+    ROOM_BACKEND = os.getenv("ROOM_BACKEND") or st.secrets.get("ROOM_BACKEND")
 except Exception:
-    GEMINI_API_KEY, GROQ_API_KEY, GROK_API_KEY = None, None, None
-
-gemini_client = genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
-groq_client = OpenAI(api_key=GROQ_API_KEY, base_url="https://api.groq.com/openai/v1") if GROQ_API_KEY else None
-grok_client = OpenAI(api_key=GROK_API_KEY, base_url="https://api.xai.com/v1") if GROK_API_KEY else None
+    ROOM_BACKEND = None
+try:
+    AI_PLANNER = os.getenv("AI_PLANNER") or st.secrets.get("AI_PLANNER")
+except Exception:
+    AI_PLANNER = None
 
+# ROOM_BACKEND=memory (預設，單一行程) 或 sqlite (WAL 持久化，多行程 / 多副本共用)
 @st.cache_resource
-def get_global_rooms(): return {}
+def get_global_rooms(): return create_room_store(ROOM_BACKEND)
 GLOBAL_ROOMS = get_global_rooms()
-VALID_FACTIONS = ["魏", "蜀", "吳", "其他"]
 
-# ==========================================
-# 🎨 遊戲常數：頭像與性格設定
-# ==========================================
-AI_PERSONALITIES = {
-    "【神算子】": "優雅、從容。極度自信，喜歡嘲笑對手的智商低。",
-    "【霸道梟雄】": "狂傲、霸氣。充滿壓迫感，動不動就威脅要砍對手腦袋。",
-    "【守護之盾】": "謙遜、死板。滿口仁義道德，就算輸了也要說大道理。"
-}
+# 🖼️ 頭像在啟動時一次載入並縮圖，所有連線共用同一份 bytes
+@st.cache_resource
+def get_avatar_cache(): return AvatarCache()
+AVATARS = get_avatar_cache()
 
-AVATAR_FILES = {
-    "【神算子】": {1: "avatars/strategist_1.png", 2: "avatars/strategist_2.png", 3: "avatars/strategist_3.png", 4: "avatars/strategist_4.png"},
-    "【霸道梟雄】": {1: "avatars/warlord_1.png", 2: "avatars/warlord_2.png", 3: "avatars/warlord_3.png", 4: "avatars/warlord_4.png"},
-    "【守護之盾】": {1: "avatars/shield_1.png", 2: "avatars/shield_2.png", 3: "avatars/shield_3.png", 4: "avatars/shield_4.png"}
-}
+# 📋 牌組表格、排名與功勳榜在房間版本變動時才重算，所有連線共用
+@st.cache_resource
+def get_render_cache(): return RenderCache()
+RENDER = get_render_cache()
 
-# ==========================================
-# 🗄️ 完整武將數據
-# ==========================================
-FACTION_ROSTERS = {
-    "魏": ["曹操", "張遼", "司馬懿", "夏侯惇", "郭嘉", "典韋", "許褚", "荀彧", "夏侯淵", "曹丕", "曹仁", "賈詡", "徐晃", "張郃", "龐德"],
-    "蜀": ["劉備", "關羽", "諸葛亮", "張飛", "趙雲", "馬超", "黃忠", "魏延", "龐統", "姜維", "法正", "黃月英", "馬岱", "關平", "劉禪"],
-    "吳": ["孫權", "周瑜", "太史慈", "孫策", "陸遜", "呂蒙", "甘寧", "黃蓋", "凌統", "周泰", "魯肅", "孫尚香", "大喬", "小喬", "程普"],
-    "其他": ["呂布", "張角", "董卓", "袁紹", "左慈", "陳宮", "馬騰", "貂蟬", "華佗", "孟獲", "祝融", "公孫瓚", "盧植", "皇甫嵩", "顏良"]
-}
+@st.cache_resource
+def get_vault_cache(): return VaultCache()
+VAULT_CACHE = get_vault_cache()
 
-GENERALS_STATS = {
-    "曹操": {"武力": 72, "智力": 91, "統帥": 96, "政治": 94, "魅力": 96, "運氣": 85},
-    "張遼": {"武力": 92, "智力": 78, "統帥": 93, "政治": 58, "魅力": 77, "運氣": 80},
-    "司馬懿": {"武力": 63, "智力": 96, "統帥": 98, "政治": 93, "魅力": 87, "運氣": 75},
-    "夏侯惇": {"武力": 90, "智力": 60, "統帥": 85, "政治": 70, "魅力": 80, "運氣": 65},
-    "郭嘉": {"武力": 15, "智力": 98, "統帥": 80, "政治": 85, "魅力": 75, "運氣": 40},
-    "典韋": {"武力": 95, "智力": 35, "統帥": 55, "政治": 29, "魅力": 58, "運氣": 45},
-    "許褚": {"武力": 96, "智力": 36, "統帥": 65, "政治": 20, "魅力": 60, "運氣": 60},
-    "荀彧": {"武力": 14, "智力": 95, "統帥": 52, "政治": 98, "魅力": 89, "運氣": 70},
-    "夏侯淵": {"武力": 91, "智力": 55, "統帥": 84, "政治": 61, "魅力": 78, "運氣": 50},
-    "曹丕": {"武力": 71, "智力": 83, "統帥": 75, "政治": 86, "魅力": 85, "運氣": 80},
-    "曹仁": {"武力": 86, "智力": 62, "統帥": 89, "政治": 52, "魅力": 76, "運氣": 70},
-    "賈詡": {"武力": 48, "智力": 97, "統帥": 86, "政治": 85, "魅力": 53, "運氣": 88},
-    "徐晃": {"武力": 90, "智力": 74, "統帥": 88, "政治": 48, "魅力": 71, "運氣": 70},
-    "張郃": {"武力": 89, "智力": 69, "統帥": 90, "政治": 57, "魅力": 71, "運氣": 60},
-    "龐德": {"武力": 94, "智力": 68, "統帥": 80, "政治": 42, "魅力": 70, "運氣": 40},
-    "劉備": {"武力": 75, "智力": 78, "統帥": 88, "政治": 85, "魅力": 99, "運氣": 95},
-    "關羽": {"武力": 97, "智力": 75, "統帥": 95, "政治": 62, "魅力": 93, "運氣": 80},
-    "諸葛亮": {"武力": 45, "智力": 100, "統帥": 98, "政治": 98, "魅力": 95, "運氣": 85},
-    "張飛": {"武力": 98, "智力": 50, "統帥": 90, "政治": 35, "魅力": 65, "運氣": 65},
-    "趙雲": {"武力": 96, "智力": 76, "統帥": 91, "政治": 65, "魅力": 90, "運氣": 85},
-    "馬超": {"武力": 97, "智力": 52, "統帥": 91, "政治": 35, "魅力": 85, "運氣": 65},
-    "黃忠": {"武力": 93, "智力": 60, "統帥": 86, "政治": 52, "魅力": 75, "運氣": 65},
-    "魏延": {"武力": 94, "智力": 72, "統帥": 89, "政治": 50, "魅力": 55, "運氣": 50},
-    "龐統": {"武力": 34, "智力": 97, "統帥": 86, "政治": 85, "魅力": 69, "運氣": 30},
-    "姜維": {"武力": 91, "智力": 92, "統帥": 94, "政治": 80, "魅力": 85, "運氣": 65},
-    "法正": {"武力": 52, "智力": 95, "統帥": 88, "政治": 82, "魅力": 60, "運氣": 75},
-    "黃月英": {"武力": 35, "智力": 95, "統帥": 65, "政治": 88, "魅力": 75, "運氣": 70},
-    "馬岱": {"武力": 85, "智力": 62, "統帥": 80, "政治": 50, "魅力": 72, "運氣": 80},
-    "關平": {"武力": 84, "智力": 75, "統帥": 82, "政治": 65, "魅力": 80, "運氣": 70},
-    "劉禪": {"武力": 25, "智力": 45, "統帥": 35, "政治": 55, "魅力": 75, "運氣": 100},
-    "孫權": {"武力": 67, "智力": 80, "統帥": 76, "政治": 89, "魅力": 95, "運氣": 88},
-    "周瑜": {"武力": 71, "智力": 96, "統帥": 97, "政治": 86, "魅力": 93, "運氣": 75},
-    "太史慈": {"武力": 93, "智力": 66, "統帥": 82, "政治": 58, "魅力": 79, "運氣": 60},
-    "孫策": {"武力": 92, "智力": 69, "統帥": 90, "政治": 70, "魅力": 90, "運氣": 50},
-    "陸遜": {"武力": 69, "智力": 95, "統帥": 96, "政治": 87, "魅力": 85, "運氣": 80},
-    "呂蒙": {"武力": 81, "智力": 89, "統帥": 91, "政治": 78, "魅力": 82, "運氣": 70},
-    "甘寧": {"武力": 94, "智力": 76, "統帥": 86, "政治": 18, "魅力": 58, "運氣": 65},
-    "黃蓋": {"武力": 83, "智力": 65, "統帥": 79, "政治": 50, "魅力": 75, "運氣": 70},
-    "凌統": {"武力": 89, "智力": 60, "統帥": 77, "政治": 42, "魅力": 71, "運氣": 60},
-    "周泰": {"武力": 91, "智力": 48, "統帥": 76, "政治": 38, "魅力": 61, "運氣": 80},
-    "魯肅": {"武力": 43, "智力": 92, "統帥": 80, "政治": 93, "魅力": 89, "運氣": 85},
-    "孫尚香": {"武力": 86, "智力": 70, "統帥": 72, "政治": 63, "魅力": 85, "運氣": 75},
-    "大喬": {"武力": 11, "智力": 73, "統帥": 26, "政治": 60, "魅力": 92, "運氣": 60},
-    "小喬": {"武力": 12, "智力": 74, "統帥": 28, "政治": 62, "魅力": 93, "運氣": 60},
-    "程普": {"武力": 79, "智力": 74, "統帥": 84, "政治": 65, "魅力": 75, "運氣": 70},
-    "呂布": {"武力": 100, "智力": 38, "統帥": 94, "政治": 25, "魅力": 65, "運氣": 45},
-    "張角": {"武力": 35, "智力": 92, "統帥": 91, "政治": 88, "魅力": 98, "運氣": 65},
-    "董卓": {"武力": 87, "智力": 74, "統帥": 90, "政治": 68, "魅力": 45, "運氣": 50},
-    "袁紹": {"武力": 72, "智力": 82, "統帥": 93, "政治": 88, "魅力": 92, "運氣": 70},
-    "左慈": {"武力": 45, "智力": 98, "統帥": 60, "政治": 55, "魅力": 85, "運氣": 99},
-    "陳宮": {"武力": 55, "智力": 92, "統帥": 85, "政治": 83, "魅力": 72, "運氣": 50},
-    "馬騰": {"武力": 82, "智力": 65, "統帥": 84, "政治": 70, "魅力": 85, "運氣": 75},
-    "貂蟬": {"武力": 30, "智力": 85, "統帥": 45, "政治": 82, "魅力": 100, "運氣": 80},
-    "華佗": {"武力": 20, "智力": 90, "統帥": 35, "政治": 65, "魅力": 95, "運氣": 85},
-    "孟獲": {"武力": 88, "智力": 55, "統帥": 82, "政治": 58, "魅力": 80, "運氣": 75},
-    "祝融": {"武力": 87, "智力": 52, "統帥": 75, "政治": 45, "魅力": 85, "運氣": 65},
-    "公孫瓚": {"武力": 86, "智力": 68, "統帥": 86, "政治": 60, "魅力": 78, "運氣": 65},
-    "盧植": {"武力": 70, "智力": 85, "統帥": 90, "政治": 88, "魅力": 88, "運氣": 75},
-    "皇甫嵩": {"武力": 75, "智力": 78, "統帥": 95, "政治": 75, "魅力": 82, "運氣": 80},
-    "顏良": {"武力": 94, "智力": 42, "統帥": 82, "政治": 35, "魅力": 55, "運氣": 50}
-}
+# 🚀 劇本由背景逐性格生成，完成一個就併入房間；尚未到齊前結算會使用備用台詞
+def start_room_dialogue(code, ai_pers):
+    start_vault_generation(ai_pers, lambda part: ENGINE.merge_dialogue(code, part), cache=VAULT_CACHE)
 
-def get_general_stats(n): 
-    return GENERALS_STATS.get(n, {"武力": 60, "智力": 60, "統帥": 60, "政治": 60, "魅力": 60, "運氣": 60})
+# 🧠 AI_PLANNER=greedy (預設) 或 lookahead；前瞻規劃器在這裡建立並預熱一次，之後 AI 選將只需查表
+@st.cache_resource
+def get_engine(): return GameEngine(GLOBAL_ROOMS, on_start=start_room_dialogue, ai_picker=make_ai_picker(AI_PLANNER))
+ENGINE = get_engine()
 
 # ==========================================
-# 🤖 AI 邏輯與多雲端調度
+# 📈 指標：重繪耗時、房間數；METRICS_EXPORT_PATH 設定時定期寫出 (.prom / .json)
 # ==========================================
-def call_ai_with_fallback(prompt: str) -> tuple:
-    last_error = None
-    if gemini_client:
-        for model in ["gemini-3.0-flash", "gemini-2.5-flash-lite", "gemini-2.5-flash"]:
-            try:
-                res = gemini_client.models.generate_content(model=model, contents=prompt)
-                if res.text: return res.text, f"Google {model}"
-            except Exception as e: last_error = e; continue
-    if groq_client:
-        try:
-            res = groq_client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
-            return res.choices[0].message.content, "Groq Llama-3.3"
-        except Exception as e: last_error = e
-    if grok_client:
-        try:
-            res = grok_client.chat.completions.create(
-                model="grok-2-latest", 
-                messages=[{"role": "user", "content": prompt}], 
-                response_format={"type": "json_object"}
-            )
-            return res.choices[0].message.content, "xAI Grok-2"
-        except Exception as e: last_error = e
-    raise RuntimeError(f"所有 AI 服務暫不可用: {last_error}")
-
-def get_ai_cards_local(available, personality):
-    card_stats = [(name, get_general_stats(name)) for name in available]
-    if "神算子" in personality: card_stats.sort(key=lambda x: sum(x[1].values()), reverse=True)
-    elif "霸道梟雄" in personality: card_stats.sort(key=lambda x: x[1]["武力"] + x[1]["統帥"], reverse=True)
-    else: card_stats.sort(key=lambda x: x[1]["政治"] + x[1]["魅力"] + x[1]["運氣"], reverse=True)
-    return [c[0] for c in card_stats[:3]]
+RERUN_SECONDS = REGISTRY.histogram("rerun_render_seconds", "整頁重繪耗時 (依房間狀態，大廳為 lobby_page)")
+ACTIVE_STATUSES = ("playing", "resolution_pending", "resolution_result")
 
-def generate_dialogue_vault(personalities):
-    if not personalities: return {}
-    pers_str = ", ".join(personalities)
-    
-    # 🚀 重點修復：提供嚴格的 JSON 模板，防止 AI 亂生格式導致找不到台詞
-    prompt = f"""你是頂尖的三國遊戲編劇。請為以下 AI 性格撰寫專屬台詞：{pers_str}
-    情境包含 6 種屬性（武力, 智力, 統帥, 政治, 魅力, 運氣），每種屬性下有 4 種名次反應(1, 2, 3, 4)。
-    第 1 名要極度囂張，第 4 名要崩潰哀嚎。每句台詞 15-35 字。
-    
-    【極度重要】請務必嚴格輸出為 JSON 格式，且「鍵值名稱」必須與以下範例完全一致（包含括號）：
-    {{
-        "{personalities[0]}": {{
-            "武力": {{"1": "台詞...", "2": "台詞...", "3": "台詞...", "4": "台詞..."}},
-            "智力": {{"1": "台詞...", "2": "台詞...", "3": "台詞...", "4": "台詞..."}},
-            "統帥": {{"1": "台詞...", "2": "台詞...", "3": "台詞...", "4": "台詞..."}},
-            "政治": {{"1": "台詞...", "2": "台詞...", "3": "台詞...", "4": "台詞..."}},
-            "魅力": {{"1": "台詞...", "2": "台詞...", "3": "台詞...", "4": "台詞..."}},
-            "運氣": {{"1": "台詞...", "2": "台詞...", "3": "台詞...", "4": "台詞..."}}
-        }}
-    }}
-    請確保所有給定的性格都在 JSON 中有對應的完整資料。
-    """
+@st.cache_resource
+def get_metrics():
+    rooms_by_status = REGISTRY.gauge("rooms", "各狀態房間數")
+    rooms_active = REGISTRY.gauge("rooms_active", "進行中 (已開局未結束) 的房間數")
+    rooms_total = REGISTRY.gauge("rooms_total", "存放區內的房間總數")
+    def collect_rooms():
+        counts = GLOBAL_ROOMS.count_by_status()
+        rooms_by_status.replace([({"status": k}, v) for k, v in counts.items()])
+        rooms_active.set(sum(counts.get(k, 0) for k in ACTIVE_STATUSES))
+        rooms_total.set(sum(counts.values()))
+    REGISTRY.add_collector(collect_rooms)
     try:
-        raw, _ = call_ai_with_fallback(prompt)
-        if "```json" in raw: raw = raw.split("```json")[1].split("```")[0].strip()
-        elif "```" in raw: raw = raw.split("```")[1].strip()
-        return json.loads(raw)
-    except Exception as e: 
-        logging.error(f"劇本生成解析失敗: {e}")
-        return {}
-
-# ==========================================
-# ⚙️ 核心戰場邏輯
-# ==========================================
-def resolve_round(code):
-    room = GLOBAL_ROOMS.get(code)
-    attr = secrets.SystemRandom().choice(["武力", "智力", "統帥", "政治", "魅力", "運氣"])
-    totals = {pid: sum(get_general_stats(c)[attr] for c in cards) for pid, cards in room["locked_cards"].items()}
-    sorted_p = sorted(totals.items(), key=lambda x: x[1], reverse=True)
-    
-    diff_1_2 = sorted_p[0][1] - sorted_p[1][1]
-    diff_1_4 = sorted_p[0][1] - sorted_p[3][1]
-    
-    pts_map = {0: 5, 1: 3, 2: 2, 3: 1}
-    status_msg = ""
-    
-    if diff_1_2 > 30: 
-        pts_map[0] = 8
-        status_msg = "💥 爆擊！碾壓獲勝！"
-    elif diff_1_2 < 5: 
-        pts_map[0] = 4
-        status_msg = "😅 險勝：慘勝如敗..."
-        
-    is_defeat = diff_1_4 > 60
-    if is_defeat: pts_map[3] = 0
-
-    ranks = {}
-    vault = room.get("dialogue_vault", {})
-    for i, (pid, tot) in enumerate(sorted_p):
-        r_num = i + 1
-        pts = pts_map.get(i, 0)
-        room["scores"][pid] += pts
-        room["decks"][pid] = [c for c in room["decks"][pid] if c not in room["locked_cards"][pid]]
-        
-        is_ai = pid.startswith("AI_")
-        pers = room["ai_personalities"].get(pid, "")
-        
-        # 如果因為任何原因 AI 找不到台詞，會顯示這句除錯提示，確保不再不明不白地顯示局勢變幻莫測
-        fallback_quote = f"（系統提示：{pers} 正在思考如何開嗆，請稍候...）"
-        final_quote = vault.get(pers, {}).get(attr, {}).get(str(r_num), fallback_quote) if is_ai else ""
-        
-        tag = status_msg if r_num == 1 else ("💀 完敗：軍心崩潰！" if r_num == 4 and is_defeat else "")
-        ranks[pid] = {
-            "faction": room["players"].get(pid, pid.replace("AI_","")),
-            "total": tot, "pts": pts, "rank": r_num, "is_ai": is_ai, 
-            "personality": pers, "quote": final_quote, "tag": tag, "cards": room["locked_cards"][pid]
-        }
-    room.update({"last_attr": attr, "results": ranks, "status": "resolution_result"})
+        path = os.getenv("METRICS_EXPORT_PATH") or st.secrets.get("METRICS_EXPORT_PATH")
+    except Exception:
+        path = None
+    if path: REGISTRY.start_exporter(path)
+    return REGISTRY
+METRICS = get_metrics()
 
 # ==========================================
 # 🖥️ UI 介面
@@ -259,16 +99,15 @@ def render_lobby():
         if st.button("🛠️ 建立戰局"):
             try:
                 st.session_state.player_id = validate_id(pid_in)
-                code = secrets.token_hex(3).upper()
-                GLOBAL_ROOMS[code] = {"players": {}, "ai_factions": [], "status": "lobby", "round": 1, "decks": {}, "locked_cards": {}, "scores": {}, "ai_personalities": {}, "dialogue_vault": {}}
+                code = ENGINE.create_room()
                 st.session_state.current_room = code; st.rerun()
             except ValueError as e: st.error(e)
             
     st.divider()
     st.subheader("🟢 公開招募板")
-    active_rooms = {c: d for c, d in GLOBAL_ROOMS.items() if d["status"] == "lobby"}
+    active_rooms = ENGINE.lobby_rooms()
     if not active_rooms: st.info("目前無戰局")
-    for c, d in active_rooms.items():
+    for c, d in active_rooms:
         if st.button(f"⚔️ 加入房間 {c} ({len(d['players'])}/4)", key=f"room_{c}"):
             try:
                 st.session_state.player_id = validate_id(pid_in)
@@ -276,6 +115,18 @@ def render_lobby():
             except ValueError as e: st.error(e)
 
     with st.expander("📡 三雲端 AI 引擎診斷"):
+        cs = VAULT_CACHE.stats
+        rs = RENDER.stats
+        st.caption(f"📋 重繪快取：命中 {rs['hits']}｜未命中 {rs['misses']}｜淘汰 {rs['evictions']}")
+        st.caption(f"🗃️ 劇本快取：記憶體命中 {cs['memory_hits']}｜磁碟命中 {cs['disk_hits']}｜未命中 {cs['misses']}｜寫入 {cs['stores']}")
+        built = {p: c["constructions"] for p, c in CLIENT_POOL.summary().items() if c["configured"]}
+        st.caption("🔗 用戶端建立次數：" + ("｜".join(f"{p} {n}" for p, n in built.items()) or "未設定任何金鑰"))
+        health = AI_SCHEDULER.health_report()
+        if health:
+            st.table([{"供應商": n, "樣本": h["samples"], "錯誤率": f"{h['error_rate']:.0%}",
+                       "p90 (秒)": f"{h['p90']:.2f}" if h["p90"] is not None else "-", "斷路": "⛔" if h["circuit_open"] else "✅"}
+                      for n, h in health.items()])
+        render_metrics()
         if st.button("🔌 測試連線"):
             with st.spinner("測試中..."):
                 try:
@@ -283,12 +134,38 @@ def render_lobby():
                     st.success(f"連線成功！當前大腦：{model}")
                 except Exception as e: st.error(f"連線失敗：{e}")
 
-def render_room():
+def render_metrics():
+    snap = METRICS.snapshot()["metrics"]
+    ms = lambda v: f"{v * 1000:,.1f}" if v is not None else "-"
+    hists = [{"指標": name, "標籤": ", ".join(f"{k}={v}" for k, v in row["labels"].items()) or "-", "次數": row["count"],
+              "p50 (ms)": ms(row["p50"]), "p90 (ms)": ms(row["p90"]), "p99 (ms)": ms(row["p99"]), "最大 (ms)": ms(row["max"])}
+             for name, m in snap.items() if m["type"] == "histogram" and name != "ai_fallback_depth" for row in m["values"]]
+    if hists: st.table(hists)
+    values = [{"指標": name, "標籤": ", ".join(f"{k}={v}" for k, v in row["labels"].items()) or "-", "數值": row["value"]}
+              for name, m in snap.items() if m["type"] != "histogram" for row in m["values"]]
+    values += [{"指標": "ai_fallback_depth", "標籤": f"outcome={row['labels'].get('outcome')}", "數值": f"平均 {row['sum'] / row['count']:.2f} 家"}
+               for row in snap.get("ai_fallback_depth", {}).get("values", []) if row["count"]]
+    if values: st.table(values)
+    c1, c2 = st.columns(2)
+    c1.download_button("⬇️ Prometheus", METRICS.prometheus(), file_name="metrics.prom", mime="text/plain")
+    c2.download_button("⬇️ JSON 快照", json.dumps(snap, ensure_ascii=False, indent=1), file_name="metrics.json", mime="application/json")
+
+ROOM_POLL_INTERVAL = 1.0   # 秒
+
+@st.fragment(run_every=ROOM_POLL_INTERVAL)
+def watch_room(code, seen_version):
+    # 局部刷新只比對版本號，房間真的有變動才觸發整頁重繪，取代手動按「刷新」
+    if ENGINE.version(code) != seen_version: st.rerun(scope="app")
+
+def render_room(view):
     code, pid = st.session_state.current_room, st.session_state.player_id
-    room = GLOBAL_ROOMS.get(code)
+    # 版本號與房間快照一起讀取：畫面快取以此版本為鍵，輪詢也以此版本比對，之後的修改下一次輪詢必定會偵測到
+    version, room = ENGINE.snapshot(code)
     if not room: st.session_state.current_room = None; st.rerun()
+    view["status"] = room["status"]
 
-    st.title(f"🏰 房間：{code} | 第 {room['round']}/5 回合")
+    st.title(f"🏰 房間：{code} | 第 {room['round']}/{TOTAL_ROUNDS} 回合")
+    if room["status"] != "finished": watch_room(code, version)
 
     if room["status"] == "lobby":
         st.write("🚩 請先選定陣營：")
@@ -296,89 +173,65 @@ def render_room():
         for i, f in enumerate(VALID_FACTIONS):
             taken = f in room["players"].values()
             if cols[i].button(f"{f}" + (" (已選)" if taken else ""), disabled=taken, key=f"btn_{f}"):
-                room["players"][pid] = f; st.rerun()
+                ENGINE.join(code, pid, f); st.rerun()
         
         if pid in room["players"] and st.button("🚀 開始遊戲", type="primary", use_container_width=True):
-            with st.spinner("撰寫劇本中... (此步驟呼叫AI可能需數秒)"):
-                taken_f = list(room["players"].values())
-                room["ai_factions"] = [f for f in VALID_FACTIONS if f not in taken_f]
-                for p_id, faction in room["players"].items():
-                    room["decks"][p_id], room["scores"][p_id] = list(FACTION_ROSTERS.get(faction, [])), 0
-                pers_pool = list(AI_PERSONALITIES.keys()); random.shuffle(pers_pool)
-                ai_pers = []
-                for af in room["ai_factions"]:
-                    ai_id = f"AI_{af}"
-                    p_name = pers_pool.pop()
-                    room["ai_personalities"][ai_id], room["decks"][ai_id], room["scores"][ai_id] = p_name, list(FACTION_ROSTERS.get(af, [])), 0
-                    ai_pers.append(p_name)
-                room["dialogue_vault"] = generate_dialogue_vault(ai_pers)
-                room["status"] = "playing"; st.rerun()
+            ENGINE.start(code, pid)
+            st.rerun()
 
     elif room["status"] == "playing":
         if pid not in room["decks"]:
-            st.warning("👀 觀戰模式中：等待戰局推進。")
-            if st.button("🔄 刷新戰況"): st.rerun()
+            st.warning("👀 觀戰模式中：等待戰局推進，畫面會自動更新。")
             return
 
         if pid in room["locked_cards"]: 
-            st.info("🔒 陣容已鎖定，等待對手..."); st.button("🔄 刷新")
+            st.info("🔒 陣容已鎖定，等待對手...（畫面會自動更新）")
         else:
-            df = pd.DataFrame([{"武將": n, **get_general_stats(n)} for n in room["decks"][pid]])
+            df = RENDER.deck_frame(room["decks"][pid])
             ev = st.dataframe(df, on_select="rerun", selection_mode="multi-row", hide_index=True)
             if len(ev.selection.rows) == 3:
                 names = df.iloc[ev.selection.rows]["武將"].tolist()
                 if st.button(f"🔐 鎖定出戰：{', '.join(names)}", type="primary", use_container_width=True):
-                    room["locked_cards"][pid] = names
-                    for af in room["ai_factions"]:
-                        ai_id = f"AI_{af}"
-                        room["locked_cards"][ai_id] = get_ai_cards_local(room["decks"][ai_id], room["ai_personalities"][ai_id])
-                    if len(room["locked_cards"]) == 4: room["status"] = "resolution_pending"
+                    ENGINE.lock_cards(code, pid, names)
                     st.rerun()
             elif len(ev.selection.rows) > 3: st.error("⚠️ 只能選擇 3 名武將！")
 
     elif room["status"] == "resolution_pending":
-        if st.button("🎲 擲骰子結算", type="primary", use_container_width=True): resolve_round(code); st.rerun()
+        if st.button("🎲 擲骰子結算", type="primary", use_container_width=True): ENGINE.resolve(code); st.rerun()
 
     elif room["status"] == "resolution_result":
         st.header(f"🎲 比拼屬性：【{room['last_attr']}】")
-        for p, r in sorted(room["results"].items(), key=lambda x: x[1]['rank']):
+        for p, r, name in RENDER.ranked_results(code, version, room):
             bg = "🟢" if p == pid else "⚪"
-            name = f"{r['personality']} ({r['faction']})" if r["is_ai"] else f"主公 {p} ({r['faction']})"
             
             # 🚀 修復 UI 顯示問題：當 tag 為空時，不再印出多餘的 ****
             tag_display = f" **{r['tag']}**" if r['tag'] else ""
             st.write(f"#### {bg} 第 {r['rank']} 名: {name} (+{r['pts']}分){tag_display}")
             
             if r["is_ai"]:
-                avatar = AVATAR_FILES.get(r['personality'], {}).get(r['rank'], "")
+                avatar = AVATARS.get(r['personality'], r['rank'])
                 c1, c2 = st.columns([1, 6])
                 with c1:
-                    if os.path.exists(avatar):
-                        st.image(avatar, use_container_width=True)
+                    if avatar:
+                        st.image(avatar.data, use_container_width=True)
                     else:
-                        st.write("🎭")
+                        st.write(FALLBACK_EMOJI)
                 with c2: st.info(f"「{r['quote']}」")
             st.write(f"出戰：{', '.join(r['cards'])} (總和 {r['total']})")
             st.divider()
 
         st.subheader("📊 目前累積功勳榜")
-        score_board = []
-        for rank, (p_id, score) in enumerate(sorted(room["scores"].items(), key=lambda x: x[1], reverse=True)):
-            is_ai = p_id.startswith("AI_")
-            display_name = f"{room['ai_personalities'].get(p_id)} ({room['players'].get(p_id, p_id.replace('AI_',''))})" if is_ai else f"主公 {p_id}"
-            score_board.append({"排名": f"第 {rank+1} 名", "名號": display_name, "總分": int(score)})
-        st.table(score_board)
+        st.table(RENDER.scoreboard(code, version, room))
 
         if pid in room["decks"] and st.button("⏭️ 下一回合", type="primary", use_container_width=True):
-            room["locked_cards"] = {}
-            if room["round"] >= 5: room["status"] = "finished"
-            else: room["round"] += 1; room["status"] = "playing"
+            ENGINE.next_round(code)
             st.rerun()
 
     elif room["status"] == "finished":
         st.balloons(); st.header("🏆 戰局結束")
-        for p, s in sorted(room["scores"].items(), key=lambda x: x[1], reverse=True): st.subheader(f"{p}: {s} 分")
+        for p, s in RENDER.standings(code, version, room): st.subheader(f"{p}: {s} 分")
         if st.button("🚪 返回大廳"): st.session_state.current_room = None; st.rerun()
 
-if st.session_state.current_room: render_room()
-else: render_lobby()
+with RERUN_SECONDS.time(status="lobby_page") as view:
+    if st.session_state.current_room: render_room(view)
+    else: render_lobby()
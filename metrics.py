@@ -0,0 +1,179 @@
+"""行程內指標：計數器、量表與直方圖，供診斷面板顯示並匯出為 Prometheus 文字檔或 JSON 快照。
+
+只用標準函式庫，熱路徑上每次紀錄只是一次加鎖與幾個整數遞增。匯出：
+
+    METRICS_EXPORT_PATH=.cache/metrics.prom   # 背景每 METRICS_EXPORT_INTERVAL 秒寫出一次 (.json 則寫 JSON 快照)
+
+給 node_exporter 的 textfile collector 或離線分析讀取。
+"""
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 秒；涵蓋 0.1 ms 的回合結算到數十秒的 LLM 呼叫
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "15"))
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs: return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+def _format_value(v):
+    if v == math.inf: return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text):
+        self.name, self.help = name, help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _prom_header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock: self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock: return [{"labels": dict(k), "value": v} for k, v in self._values.items()]
+
+    def prometheus(self):
+        with self._lock: items = list(self._values.items())
+        return self._prom_header() + [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock: self._values[key] = value
+
+    def replace(self, values):
+        """以 [(labels, value), ...] 取代全部數值 (例如各狀態房間數，消失的狀態不應留下舊值)。"""
+        with self._lock: self._values = {_label_key(labels): v for labels, v in values}
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            h = self._values.get(key)
+            if h is None: h = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0, "max": 0.0}
+            h["counts"][i] += 1
+            h["sum"] += value
+            h["count"] += 1
+            h["max"] = max(h["max"], value)
+
+    @contextmanager
+    def time(self, **labels):
+        """計時區塊；可在區塊內修改取得的 labels (例如讀到房間後才知道狀態)。"""
+        t0 = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def quantile(self, h, q):
+        # 由桶內計數線性內插估計分位數，最高的桶以觀測到的最大值為上界
+        if not h["count"]: return None
+        target, seen = q * h["count"], 0
+        for i, c in enumerate(h["counts"]):
+            if c and seen + c >= target:
+                lo = self.buckets[i - 1] if i else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else h["max"]
+                return lo + (min(hi, h["max"]) - lo) * (target - seen) / c
+            seen += c
+        return h["max"]
+
+    def snapshot(self):
+        with self._lock: items = [(k, dict(h, counts=list(h["counts"]))) for k, h in self._values.items()]
+        return [{"labels": dict(k), "count": h["count"], "sum": h["sum"], "max": h["max"],
+                 "p50": self.quantile(h, 0.5), "p90": self.quantile(h, 0.9), "p99": self.quantile(h, 0.99),
+                 "buckets": dict(zip([*map(str, self.buckets), "+Inf"], h["counts"]))} for k, h in items]
+
+    def prometheus(self):
+        with self._lock: items = [(k, list(h["counts"]), h["sum"], h["count"]) for k, h in self._values.items()]
+        lines = self._prom_header()
+        for key, counts, total, count in items:
+            cum = 0
+            for le, c in zip([*self.buckets, math.inf], counts):
+                cum += c
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(le))])} {cum}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None: metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            elif type(metric) is not cls: raise ValueError(f"指標 {name} 已註冊為 {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text): return self._register(Counter, name, help_text)
+    def gauge(self, name, help_text): return self._register(Gauge, name, help_text)
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS): return self._register(Histogram, name, help_text, buckets=buckets)
+
+    def add_collector(self, fn):
+        # fn() 在每次快照 / 匯出前呼叫，用來更新取樣型量表 (例如房間數)
+        with self._lock: self._collectors.append(fn)
+
+    def collect(self):
+        with self._lock: collectors, metrics = list(self._collectors), list(self._metrics.values())
+        for fn in collectors:
+            try: fn()
+            except Exception as e: logging.error(f"指標收集失敗: {e}")
+        return metrics
+
+    def snapshot(self):
+        return {"timestamp": time.time(),
+                "metrics": {m.name: {"type": m.kind, "help": m.help, "values": m.snapshot()} for m in self.collect()}}
+
+    def prometheus(self):
+        return "\n".join(line for m in self.collect() for line in m.prometheus()) + "\n"
+
+    def write(self, path):
+        """依副檔名寫出 JSON 快照 (.json) 或 Prometheus 文字格式 (其他)；先寫暫存檔再改名，讀取端不會讀到半份。"""
+        body = json.dumps(self.snapshot(), ensure_ascii=False, indent=1) if path.endswith(".json") else self.prometheus()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f: f.write(body)
+        os.replace(tmp, path)
+
+    def start_exporter(self, path, interval=EXPORT_INTERVAL):
+        def loop():
+            while True:
+                try: self.write(path)
+                except Exception as e: logging.error(f"指標匯出失敗 ({path}): {e}")
+                time.sleep(interval)
+        threading.Thread(target=loop, daemon=True, name="metrics-exporter").start()
+
+REGISTRY = MetricsRegistry()
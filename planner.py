@@ -0,0 +1,265 @@
+"""前瞻 AI 選將：屬性在鎖定後才隨機抽出，出過的武將也不再回到牌組，因此以「剩餘回合的期望總分」選本回合陣容。
+
+- 對手模型：其他三家為貪婪 AI (`get_ai_cards_local`) 時，每回合、每個屬性下各陣容總和可得的期望分數表
+- 每副牌組先算出所有三人組合在六個屬性的總和，再依剩餘回合數逐層以 NumPy 向量化求解最佳分配
+- 置換表以「剩餘牌組的武將位元遮罩」為鍵；一次求解即填入之後各回合的所有可能狀態，往後每步只需查表
+- 性格保留為小幅加權：期望分數相近時，神算子讓六維高者、梟雄讓武力統帥高者、守護之盾讓政治魅力運氣高者先上場
+- 每步有時間預算，超時改用貪婪選將
+
+量測每秒決策數與對貪婪 AI 的勝率：
+
+    python planner.py --games 200000
+"""
+import argparse
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from game_rules import (
+    VALID_FACTIONS, TOTAL_ROUNDS, AI_PERSONALITIES, FACTION_ROSTERS, STAT_ATTRS, STATS_LOOKUP, UNKNOWN_ROW,
+    PERSONALITY_SCORES, SCORING_RULES, general_rows, get_ai_cards_local, personality_key
+)
+from simulator import NUM_PLAYERS, CARDS_PER_ROUND, score_rounds, _ai_plan_table
+
+TIME_BUDGET = 0.25         # 秒；單步求解超過此時間即改用貪婪選將
+PERSONALITY_BIAS = 0.3     # 性格加權最多影響的期望分數
+TT_CAPACITY = 1 << 17      # 置換表項數上限 (開局預熱約填入 13 萬項)，超過時淘汰最久未使用者
+MAX_CELLS = 1 << 19        # 單次向量化比對的 (狀態 × 組合) 格數上限，控制記憶體用量
+
+def expected_points_table(rounds=TOTAL_ROUNDS, rules=SCORING_RULES):
+    """回傳 ev[回合, 屬性, 陣容總和]：面對三家貪婪 AI 時該回合的期望得分。
+
+    對手為任三個不同陣營、性格各自均勻分佈；同分時本方排在最後 (保守估計)。
+    """
+    plan = _ai_plan_table(rounds)                                    # (陣營, 性格, 回合, 屬性)
+    scenarios = [(fs, ps) for fs in itertools.combinations(range(NUM_PLAYERS), NUM_PLAYERS - 1)
+                 for ps in itertools.product(range(plan.shape[1]), repeat=NUM_PLAYERS - 1)]
+    f_idx = np.array([fs for fs, _ in scenarios])[:, :, None, None]
+    p_idx = np.array([ps for _, ps in scenarios])[:, :, None, None]
+    opp = plan[f_idx, p_idx, np.arange(rounds)[:, None], np.arange(len(STAT_ATTRS))]   # (情境, 3, 回合, 屬性)
+    opp = opp.transpose(2, 3, 0, 1)                                  # (回合, 屬性, 情境, 3)
+
+    own = np.arange(CARDS_PER_ROUND * int(STATS_LOOKUP.max()) + 1)
+    shape = opp.shape[:2] + (own.size, opp.shape[2])
+    totals = np.empty(shape + (NUM_PLAYERS,), dtype=np.int64)
+    totals[..., :-1] = opp[:, :, None]
+    totals[..., -1] = own[:, None]
+    pts = score_rounds(totals.reshape(-1, NUM_PLAYERS), rules)[0][:, -1]
+    return pts.reshape(shape).mean(axis=-1)
+
+def deck_mask(rows):
+    # 以 GENERAL_INDEX 為位元位置；60 名武將可放進單一 int64
+    return int((np.int64(1) << rows.astype(np.int64)).sum())
+
+_PKEY_INDEX = {k: i for i, k in enumerate(PERSONALITY_SCORES)}
+
+def tt_key(pkey, rounds_left, mask):
+    # 置換表鍵編成單一整數 (牌組遮罩 | 剩餘回合 | 性格)，比 tuple 鍵省下大半記憶體
+    return mask << 8 | rounds_left << 3 | _PKEY_INDEX[pkey]
+
+class LookaheadPlanner:
+    def __init__(self, time_budget=TIME_BUDGET, bias=PERSONALITY_BIAS, tt_capacity=TT_CAPACITY, rules=SCORING_RULES):
+        self.time_budget, self.bias, self.tt_capacity = time_budget, bias, tt_capacity
+        self.ev = expected_points_table(TOTAL_ROUNDS, rules)
+        self._tt = OrderedDict()       # tt_key(性格, 剩餘回合, 牌組遮罩) -> 最佳陣容遮罩
+        self._lock = threading.Lock()
+        self._solve_lock = threading.Lock()   # 一次只跑一個求解：並行求解會搶 GIL 而一起超時，且多半在算同一個狀態
+        self.stats = {"decisions": 0, "tt_hits": 0, "solves": 0, "timeouts": 0}
+
+    def choose(self, available, personality, rounds_left=None):
+        available = list(available)
+        max_rounds = len(available) // CARDS_PER_ROUND
+        rounds_left = max_rounds if rounds_left is None else min(rounds_left, max_rounds)
+        rows = general_rows(available)
+        # 不在數據表中 (無法編入遮罩) 或重複的武將，直接沿用貪婪選將
+        if rounds_left < 1 or (rows == UNKNOWN_ROW).any() or len(set(rows.tolist())) != len(rows):
+            return get_ai_cards_local(available, personality)
+
+        pkey = personality_key(personality)
+        key = tt_key(pkey, rounds_left, deck_mask(rows))
+        with self._lock: self.stats["decisions"] += 1
+        hit = self._lookup(key)
+        if hit is not None:
+            with self._lock: self.stats["tt_hits"] += 1
+        else:
+            deadline = time.perf_counter() + self.time_budget
+            if self._solve_lock.acquire(timeout=self.time_budget):
+                try:
+                    # 等待期間其他執行緒的求解可能已涵蓋此狀態
+                    hit = self._lookup(key)
+                    if hit is None and self._solve(rows, pkey, rounds_left, deadline): hit = self._lookup(key)
+                finally:
+                    self._solve_lock.release()
+        if hit is None: return get_ai_cards_local(available, personality)
+        return [c for c, g in zip(available, rows.tolist()) if hit >> g & 1]
+
+    def warm(self, rounds=TOTAL_ROUNDS):
+        """不限時求解各陣營完整牌組 × 各性格的開局狀態，之後 AI 的每一步都能直接查表。"""
+        for faction in VALID_FACTIONS:
+            rows = general_rows(FACTION_ROSTERS[faction])
+            mask = deck_mask(rows)
+            for pers in AI_PERSONALITIES:
+                pkey = personality_key(pers)
+                with self._solve_lock:
+                    if self._lookup(tt_key(pkey, rounds, mask)) is None: self._solve(rows, pkey, rounds, float("inf"))
+
+    def _lookup(self, key):
+        with self._lock:
+            hit = self._tt.get(key)
+            if hit is not None: self._tt.move_to_end(key)
+            return hit
+
+    def trio_values(self, sums, scores, rounds_left):
+        """sums: (組合, 屬性) 陣容總和；scores: (組合,) 正規化性格分數。回傳本回合各組合的期望分數 + 性格加權。"""
+        r = min(max(TOTAL_ROUNDS - rounds_left, 0), self.ev.shape[0] - 1)
+        # 整副牌終究會出完，性格分數總和固定；依剩餘回合加權，性格才會體現在「偏好的武將先上場」
+        return self.ev[r][np.arange(sums.shape[1]), sums].mean(axis=1) + self.bias * scores * rounds_left / TOTAL_ROUNDS
+
+    def _solve(self, rows, pkey, rounds, deadline):
+        """由剩餘回合最少的狀態往上逐層求解，每層完成即寫入置換表；超過 deadline 回傳 False。"""
+        with self._lock: self.stats["solves"] += 1
+        n = len(rows)
+        trios = np.array(list(itertools.combinations(range(n), CARDS_PER_ROUND)))
+        tmask = (np.int64(1) << trios).sum(axis=1)
+        sums = STATS_LOOKUP[rows][trios].sum(axis=1)                        # 預先算好各組合六屬性總和
+        pscore = PERSONALITY_SCORES[pkey]
+        scores = pscore[rows][trios].sum(axis=1) / (CARDS_PER_ROUND * pscore[:UNKNOWN_ROW].max())
+        gbits = np.int64(1) << rows.astype(np.int64)                         # 本地位元 -> 全域武將位元
+
+        value = np.full(1 << n, -np.inf)
+        value[self._masks(n, n - CARDS_PER_ROUND * rounds)] = 0.0
+        step = max(1, MAX_CELLS // len(trios))
+        for left in range(1, rounds + 1):
+            masks = self._masks(n, n - CARDS_PER_ROUND * (rounds - left))
+            f = self.trio_values(sums, scores, left)
+            best = np.empty(masks.size, dtype=np.intp)
+            for i in range(0, masks.size, step):
+                if time.perf_counter() > deadline:
+                    with self._lock: self.stats["timeouts"] += 1
+                    return False
+                chunk = masks[i:i + step, None]
+                cand = np.where((chunk & tmask) == tmask, f + value[chunk ^ tmask], -np.inf)
+                best[i:i + step] = cand.argmax(axis=1)
+                value[masks[i:i + step]] = cand[np.arange(chunk.shape[0]), best[i:i + step]]
+            self._store(pkey, left, self._globalize(masks, gbits), self._globalize(tmask[best], gbits))
+        return True
+
+    @staticmethod
+    def _masks(n, size):
+        if size <= 0: return np.zeros(1, dtype=np.int64)
+        combos = np.array(list(itertools.combinations(range(n), size)))
+        return (np.int64(1) << combos).sum(axis=1)
+
+    @staticmethod
+    def _globalize(masks, gbits):
+        bits = (masks[:, None] >> np.arange(gbits.size)) & 1
+        return (bits * gbits).sum(axis=1)
+
+    def _store(self, pkey, left, masks, moves):
+        with self._lock:
+            for m, t in zip(masks.tolist(), moves.tolist()):
+                self._tt[tt_key(pkey, left, m)] = t
+            while len(self._tt) > self.tt_capacity: self._tt.popitem(last=False)
+
+    def __len__(self):
+        with self._lock: return len(self._tt)
+
+_DEFAULT = None
+_DEFAULT_LOCK = threading.Lock()
+
+def default_planner():
+    """整個行程共用的規劃器；第一次呼叫時建立期望分數表並預熱開局狀態 (約 1~2 秒)。
+
+    應在啟動時 (任何房間鎖之外) 呼叫一次，之後 AI 選將只需查表。
+    """
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            planner = LookaheadPlanner()
+            planner.warm()
+            _DEFAULT = planner
+        return _DEFAULT
+
+def plan_ai_cards(available, personality, rounds_left=None):
+    return default_planner().choose(available, personality, rounds_left)
+
+# ==========================================
+# ⏱️ 基準測試
+# ==========================================
+def plan_table(picker, rounds=TOTAL_ROUNDS):
+    """與 `simulator._ai_plan_table` 同形狀：picker(deck, personality, rounds_left) 的 (陣營, 性格, 回合, 屬性) 陣容總和。"""
+    pers_names = list(AI_PERSONALITIES)
+    table = np.zeros((NUM_PLAYERS, len(pers_names), rounds, len(STAT_ATTRS)), dtype=np.int64)
+    for f, faction in enumerate(VALID_FACTIONS):
+        for p, pers in enumerate(pers_names):
+            deck = list(FACTION_ROSTERS[faction])
+            for r in range(rounds):
+                picks = picker(deck, pers, rounds - r)
+                table[f, p, r] = STATS_LOOKUP[general_rows(picks)].sum(axis=0)
+                deck = [c for c in deck if c not in picks]
+    return table
+
+def decisions_per_second(planner, games=200, seed=0):
+    """回傳 (冷啟動單步求解秒數, 置換表命中後每秒決策數)。"""
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+    planner.choose(FACTION_ROSTERS[VALID_FACTIONS[0]], list(AI_PERSONALITIES)[0])
+    cold = time.perf_counter() - t0
+    plan_table(planner.choose)          # 填滿 12 種 (陣營, 性格) 開局後的所有狀態
+
+    decisions, t0 = 0, time.perf_counter()
+    for _ in range(games):
+        faction = VALID_FACTIONS[rng.integers(NUM_PLAYERS)]
+        pers = list(AI_PERSONALITIES)[rng.integers(len(AI_PERSONALITIES))]
+        deck = list(FACTION_ROSTERS[faction])
+        for r in range(TOTAL_ROUNDS):
+            picks = planner.choose(deck, pers, TOTAL_ROUNDS - r)
+            deck = [c for c in deck if c not in picks]
+            decisions += 1
+    return cold, decisions / (time.perf_counter() - t0)
+
+def win_rates(lookahead_table, greedy_table, games=200_000, seed=0, rules=SCORING_RULES):
+    """四家 AI 對戰，隨機一家改用前瞻選將；回傳 {選將法: (該座位勝率, 平均總分)}。同分並列時平分勝場。"""
+    rng = np.random.default_rng(seed)
+    rounds = greedy_table.shape[2]
+    pers = rng.integers(0, greedy_table.shape[1], size=(games, NUM_PLAYERS))
+    attrs = rng.integers(0, len(STAT_ATTRS), size=(games, rounds))
+    seat = rng.integers(0, NUM_PLAYERS, size=games)
+    idx = (np.arange(NUM_PLAYERS)[None, None, :], pers[:, None, :], np.arange(rounds)[None, :, None], attrs[:, :, None])
+    base = greedy_table[idx]                                             # (局, 回合, 座位)
+    results = {}
+    for name, table in (("貪婪", greedy_table), ("前瞻", lookahead_table)):
+        totals = base.copy()
+        g = np.arange(games)
+        totals[g, :, seat] = table[seat[:, None], pers[g, seat][:, None], np.arange(rounds), attrs]
+        pts = score_rounds(totals.reshape(-1, NUM_PLAYERS), rules)[0].reshape(games, rounds, NUM_PLAYERS).sum(axis=1)
+        top = pts == pts.max(axis=1, keepdims=True)
+        win = top[g, seat] / top.sum(axis=1)
+        results[name] = (float(win.mean()), float(pts[g, seat].mean()))
+    return results
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="前瞻 AI 選將基準測試")
+    ap.add_argument("--games", type=int, default=200_000, help="勝率模擬局數")
+    ap.add_argument("--decisions", type=int, default=200, help="量測決策速度的對局數")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    planner = LookaheadPlanner()
+    build = time.perf_counter() - t0
+    cold, warm = decisions_per_second(planner, args.decisions, args.seed)
+    print(f"🧠 期望分數表建立 {build * 1000:.0f} ms｜冷啟動單步求解 {cold * 1000:.1f} ms｜置換表 {len(planner):,} 項")
+    print(f"   置換表命中後 {warm:,.0f} 決策/秒｜{planner.stats}")
+
+    greedy = plan_table(lambda deck, pers, left: get_ai_cards_local(deck, pers))
+    rates = win_rates(plan_table(planner.choose), greedy, args.games, args.seed)
+    print(f"⚔️ {args.games:,} 局四家 AI 對戰，隨機一家改用前瞻選將 (基準勝率 {1 / NUM_PLAYERS:.0%})")
+    for name, (win, pts) in rates.items(): print(f"   {name}：勝率 {win:.2%}｜平均總分 {pts:.2f}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+"""重繪路徑的記憶化層：牌組表格、功勳榜與回合排名在每次狀態變更後只計算一次，同房所有觀看者共用。
+
+- 牌組表格以「牌組內容」為鍵：同陣營開局牌組完全相同，跨房間也能共用
+- 功勳榜、回合排名與最終戰績以「房間代碼 + 建立時的 nonce + 版本號」為鍵：房間沒有變動時直接取用上次結果；
+  清除後重新發出的同一代碼有不同 nonce，不會取到舊房間的結果
+- 單一 LRU，容量有上限，超過時淘汰最久未使用者
+
+量測每次重繪的成本：
+
+    python render_cache.py
+"""
+import argparse
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from game_rules import VALID_FACTIONS, AI_PERSONALITIES, FACTION_ROSTERS, STAT_ATTRS, stats_frame
+
+RENDER_CAPACITY = 512      # 鍵數上限；每個房間同時最多佔用 3 個鍵，牌組表格則隨回合遞減
+
+def build_standings(room):
+    return sorted(room["scores"].items(), key=lambda x: x[1], reverse=True)
+
+def build_scoreboard(room):
+    score_board = []
+    for rank, (p_id, score) in enumerate(build_standings(room)):
+        is_ai = p_id.startswith("AI_")
+        display_name = f"{room['ai_personalities'].get(p_id)} ({room['players'].get(p_id, p_id.replace('AI_',''))})" if is_ai else f"主公 {p_id}"
+        score_board.append({"排名": f"第 {rank+1} 名", "名號": display_name, "總分": int(score)})
+    return score_board
+
+def build_ranked_results(room):
+    """回傳依名次排序的 [(pid, 結果, 顯示名稱), ...]；與觀看者相關的標記留給畫面層處理。"""
+    ranked = []
+    for p, r in sorted(room["results"].items(), key=lambda x: x[1]['rank']):
+        name = f"{r['personality']} ({r['faction']})" if r["is_ai"] else f"主公 {p} ({r['faction']})"
+        ranked.append((p, r, name))
+    return ranked
+
+class RenderCache:
+    def __init__(self, capacity=RENDER_CAPACITY):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _get_or_build(self, key, build, *args):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+            self.stats["misses"] += 1
+        # 在鎖外計算：同一鍵偶爾重複計算無妨，結果相同
+        value = build(*args)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return value
+
+    # 回傳的物件為所有觀看者共用，呼叫端不可修改；version 必須是與 room 一起讀出的版本 (store.snapshot)
+    def deck_frame(self, names):
+        return self._get_or_build(("deck", tuple(names)), stats_frame, list(names))
+
+    def scoreboard(self, code, version, room):
+        return self._get_or_build(("scoreboard", code, room.get("nonce"), version), build_scoreboard, room)
+
+    def ranked_results(self, code, version, room):
+        return self._get_or_build(("results", code, room.get("nonce"), version), build_ranked_results, room)
+
+    def standings(self, code, version, room):
+        return self._get_or_build(("standings", code, room.get("nonce"), version), build_standings, room)
+
+    def __len__(self):
+        with self._lock: return len(self._entries)
+
+# ==========================================
+# ⏱️ 微基準測試
+# ==========================================
+def sample_room(rng, round_no=3):
+    """造一個停在「回合結果」畫面的房間：一位真人、三個 AI，牌組已打掉 round_no 輪。"""
+    human, *ais = rng.sample(VALID_FACTIONS, len(VALID_FACTIONS))
+    pers = list(AI_PERSONALITIES)
+    ids = {"hero": human, **{f"AI_{f}": f for f in ais}}
+    room = {"players": {"hero": human}, "ai_personalities": {f"AI_{f}": p for f, p in zip(ais, pers)},
+            "decks": {}, "scores": {}, "results": {}, "status": "resolution_result", "round": round_no}
+    for rank, (pid, faction) in enumerate(rng.sample(list(ids.items()), len(ids)), start=1):
+        deck = list(FACTION_ROSTERS[faction])
+        room["decks"][pid] = deck[:len(deck) - 3 * round_no]
+        room["scores"][pid] = rng.randint(0, 40)
+        is_ai = pid.startswith("AI_")
+        room["results"][pid] = {"faction": faction, "total": rng.randint(150, 300), "pts": 0, "rank": rank, "is_ai": is_ai,
+                                "personality": room["ai_personalities"].get(pid, ""), "quote": "", "tag": "",
+                                "cards": deck[-3:]}
+    return room
+
+def rerun_cost(room, cache=None, reps=2000):
+    """一次重繪中與畫面資料有關的計算：自己的牌組表格、回合排名與功勳榜 (單位：秒)。"""
+    t0 = time.perf_counter()
+    if cache is None:
+        for _ in range(reps):
+            stats_frame(room["decks"]["hero"]); build_ranked_results(room); build_scoreboard(room)
+    else:
+        for _ in range(reps):
+            cache.deck_frame(room["decks"]["hero"]); cache.ranked_results("BENCH", 7, room); cache.scoreboard("BENCH", 7, room)
+    return (time.perf_counter() - t0) / reps
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="重繪記憶化微基準測試")
+    ap.add_argument("--reps", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    room = sample_room(random.Random(args.seed))
+    cache = RenderCache()
+    rerun_cost(room, cache, reps=1)   # 第一次重繪填入快取，之後同一版本的重繪全部命中
+    before, after = rerun_cost(room, reps=args.reps), rerun_cost(room, cache, reps=args.reps)
+    print(f"🖥️ 每次重繪 (牌組 {len(room['decks']['hero'])} 張 × {len(STAT_ATTRS)} 屬性 + 排名 + 功勳榜)")
+    print(f"   每次重建 {before * 1e6:,.1f} µs → 記憶化 {after * 1e6:,.2f} µs ({before / after:,.0f}×)")
+    print(f"   快取：命中 {cache.stats['hits']}｜未命中 {cache.stats['misses']}｜{len(cache)} 鍵")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
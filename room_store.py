@@ -0,0 +1,267 @@
+"""執行緒安全的房間存放區：取代原本共用的 GLOBAL_ROOMS dict。
+
+- 每個房間一把鎖，`mutate()` 在工作副本上修改，正常離開且內容有變動才整份提交，且可要求房間處於指定狀態 (避免重複鎖定、重複結算)
+- 維護「招募中」房間的次要索引，大廳不必掃描所有房間
+- 記錄最後活動時間，背景清道夫定期移除閒置或已結束的房間
+
+壓力測試：
+
+    python room_store.py --threads 64
+    python room_store.py --backend sqlite --threads 16
+"""
+import argparse
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+from game_rules import VALID_FACTIONS, TOTAL_ROUNDS
+
+IDLE_TTL = 2 * 3600        # 秒；任何狀態閒置超過此時間即移除
+FINISHED_TTL = 10 * 60     # 秒；已結束的房間保留較短時間供玩家查看結果
+REAP_INTERVAL = 60         # 秒
+
+def new_room():
+    # nonce 區分同一代碼前後不同的房間：代碼在清除後可能重新發出，版本號也會從 0 重新計算
+    return {"players": {}, "ai_factions": [], "status": "lobby", "round": 1, "decks": {}, "locked_cards": {}, "scores": {}, "ai_personalities": {}, "dialogue_vault": {},
+            "nonce": secrets.token_hex(4)}
+
+def copy_room(obj):
+    # 房間內容只有 dict / list / 純量 (與 SQLite 後端的 JSON 欄位相同)，比 copy.deepcopy 快約 3 倍
+    if type(obj) is dict: return {k: copy_room(v) for k, v in obj.items()}
+    if type(obj) is list: return [copy_room(v) for v in obj]
+    return obj
+
+BACKENDS = ("memory", "sqlite")
+
+def create_room_store(backend=None, db_path=None, **kwargs):
+    # ROOM_BACKEND=sqlite 時改用 SQLite (WAL) 持久化，讓多個行程 / 副本共用房間狀態
+    backend = backend or os.getenv("ROOM_BACKEND", "memory")
+    if backend == "sqlite":
+        from sqlite_room_store import SqliteRoomStore, DEFAULT_DB_PATH
+        return SqliteRoomStore(db_path or DEFAULT_DB_PATH, **kwargs)
+    if backend != "memory": raise ValueError(f"未知的房間存放後端: {backend}")
+    return RoomStore(**kwargs)
+
+class RoomStore:
+    def __init__(self, idle_ttl=IDLE_TTL, finished_ttl=FINISHED_TTL, reap_interval=REAP_INTERVAL):
+        self.idle_ttl, self.finished_ttl = idle_ttl, finished_ttl
+        self._rooms, self._locks, self._touched, self._versions = {}, {}, {}, {}
+        self._lobby = set()
+        self._lock = threading.Lock()      # 只保護上面幾個索引結構；房間內容由各自的房間鎖保護
+        self.stats = {"created": 0, "reaped": 0}
+        if reap_interval:
+            self._stop = threading.Event()
+            threading.Thread(target=self._reap_loop, args=(reap_interval,), daemon=True, name="room-reaper").start()
+
+    # ---------- 查詢 ----------
+    def get(self, code):
+        """回傳房間快照 (與 SQLite 後端相同)；呼叫端可在鎖外任意讀取，修改快照不影響房間。"""
+        return self.snapshot(code)[1]
+
+    def snapshot(self, code):
+        """回傳 (版本號, 房間快照)，兩者在同一把鎖內讀取、彼此一致；房間不存在時回傳 (None, None)。"""
+        with self._lock:
+            room, version = self._rooms.get(code), self._versions.get(code)
+            if room is not None: self._touched[code] = time.monotonic()
+        # 已提交的房間不會再被原地修改 (mutate 整份替換)，在鎖外複製即可
+        return (None, None) if room is None else (version, copy_room(room))
+
+    def version(self, code):
+        # 每次修改遞增的版本號；房間不存在時回傳 None
+        with self._lock: return self._versions.get(code)
+
+    def __contains__(self, code):
+        with self._lock: return code in self._rooms
+
+    def __len__(self):
+        with self._lock: return len(self._rooms)
+
+    def lobby_rooms(self):
+        with self._lock: rooms = [(c, self._rooms[c]) for c in sorted(self._lobby)]
+        return [(c, copy_room(r)) for c, r in rooms]
+
+    def count_by_status(self):
+        with self._lock: rooms = list(self._rooms.values())
+        counts = {}
+        for r in rooms: counts[r["status"]] = counts.get(r["status"], 0) + 1
+        return counts
+
+    # ---------- 修改 ----------
+    def create(self, room=None):
+        room = room if room is not None else new_room()
+        with self._lock:
+            code = secrets.token_hex(3).upper()
+            while code in self._rooms: code = secrets.token_hex(3).upper()
+            self._rooms[code], self._locks[code], self._touched[code], self._versions[code] = room, threading.RLock(), time.monotonic(), 0
+            if room["status"] == "lobby": self._lobby.add(code)
+            self.stats["created"] += 1
+        return code
+
+    @contextmanager
+    def mutate(self, code, expect_status=None):
+        """在房間鎖內取得房間的工作副本；房間不存在或狀態不符 expect_status 時取得 None。
+
+        區塊正常結束且內容有變動時才整份替換並遞增版本號 (與 SQLite 後端相同，無變動不觸發重繪)，
+        同時依最新狀態更新招募索引與活動時間；區塊內拋出例外則捨棄副本，房間維持原狀。
+        """
+        with self._lock: lock = self._locks.get(code)
+        if lock is None:
+            yield None
+            return
+        with lock:
+            room = self._rooms.get(code)
+            if room is None or (expect_status is not None and room["status"] != expect_status):
+                yield None
+                return
+            work = copy_room(room)
+            yield work
+            if work == room: return
+            with self._lock:
+                if code in self._rooms:
+                    self._rooms[code] = work
+                    self._touched[code] = time.monotonic()
+                    self._versions[code] += 1
+                    if work["status"] == "lobby": self._lobby.add(code)
+                    else: self._lobby.discard(code)
+
+    def update(self, code, fn, expect_status=None):
+        """以 fn(room) 原子修改房間並回傳其結果；房間不存在或狀態不符時回傳 None。"""
+        with self.mutate(code, expect_status) as room:
+            return None if room is None else fn(room)
+
+    def remove(self, code):
+        with self._lock:
+            self._lobby.discard(code)
+            self._touched.pop(code, None); self._locks.pop(code, None); self._versions.pop(code, None)
+            return self._rooms.pop(code, None)
+
+    # ---------- 清道夫 ----------
+    def reap(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            stale = [c for c, t in self._touched.items()
+                     if now - t > (self.finished_ttl if self._rooms[c]["status"] == "finished" else self.idle_ttl)]
+        removed = 0
+        for code in stale:
+            # 取得房間鎖再刪除，避免刪掉正在被修改的房間
+            with self._lock: lock = self._locks.get(code)
+            if lock is None or not lock.acquire(blocking=False): continue
+            try:
+                with self._lock:
+                    t, room = self._touched.get(code), self._rooms.get(code)
+                    if room is None or now - t <= (self.finished_ttl if room["status"] == "finished" else self.idle_ttl): continue
+                    self._lobby.discard(code)
+                    del self._rooms[code], self._touched[code], self._locks[code], self._versions[code]
+                    self.stats["reaped"] += 1
+                    removed += 1
+            finally:
+                lock.release()
+        if removed: logging.info(f"房間清道夫：移除 {removed} 個閒置房間")
+        return removed
+
+    def _reap_loop(self, interval):
+        while not self._stop.wait(interval):
+            try: self.reap()
+            except Exception as e: logging.error(f"房間清道夫失敗: {e}")
+
+    def close(self):
+        if hasattr(self, "_stop"): self._stop.set()
+
+# ==========================================
+# 🧪 壓力測試
+# ==========================================
+def stress_test(threads=64, rooms=200, ops=2000, seed=0, backend="memory"):
+    """多執行緒同時搶陣營、鎖牌、推進回合、讀取快照並讓清道夫同時運作，回傳違反不變量的清單 (應為空)。
+
+    執行期間的 TTL 遠長於壓測時間，清道夫不應移除任何房間；壓測結束後另一階段縮短 TTL，確認所有房間都會被清除。
+    """
+    import random
+    import tempfile
+    db_path = os.path.join(tempfile.mkdtemp(), "stress.sqlite3") if backend == "sqlite" else None
+    store = create_room_store(backend, db_path=db_path, idle_ttl=3600, finished_ttl=3600, reap_interval=0.01)
+    codes = [store.create() for _ in range(rooms)]
+    errors, errors_lock = [], threading.Lock()
+    transitions = {"lock": 0, "advance": 0}
+
+    def fail(msg):
+        with errors_lock: errors.append(msg)
+
+    def join(room, pid, f):
+        if f not in room["players"].values() and pid not in room["players"]: room["players"][pid] = f
+        if len(set(room["players"].values())) != len(room["players"]): fail("陣營重複")
+        if len(room["players"]) >= 2:
+            room["locked_cards"] = {}
+            room["status"] = "playing"
+
+    def lock(room, pid, w):
+        if pid in room["locked_cards"]: return None
+        if pid in room["players"] or len(room["locked_cards"]) < 4: room["locked_cards"][pid] = [w]
+        if len(room["locked_cards"]) > 4: fail("鎖定超過 4 人")
+        if len(room["locked_cards"]) == 4:
+            room["status"] = "resolution_result"
+            return "lock"
+
+    def advance(room):
+        room["locked_cards"] = {}
+        if room["round"] >= TOTAL_ROUNDS: room["status"] = "finished"
+        else: room["round"] += 1; room["status"] = "playing"
+        if room["round"] > TOTAL_ROUNDS: fail(f"回合超過 {TOTAL_ROUNDS}")
+        return "advance"
+
+    def read(code):
+        # 快照在鎖外逐項讀取，其他執行緒同時修改也不會改變它
+        room = store.get(code)
+        if room is None: fail(f"{code} 在壓測期間消失"); return None
+        try:
+            if sum(1 for _ in room["locked_cards"].items()) > 4: fail("快照鎖定超過 4 人")
+        except RuntimeError: fail("快照在讀取中被修改")
+
+    def worker(w):
+        rng = random.Random(seed + w)
+        pid = f"p{w}"
+        for _ in range(ops):
+            code = rng.choice(codes)
+            action = rng.random()
+            if action < 0.1: done = read(code)
+            elif action < 0.4: done = store.update(code, lambda r: join(r, pid, rng.choice(VALID_FACTIONS)), "lobby")
+            elif action < 0.8: done = store.update(code, lambda r: lock(r, pid, w), "playing")
+            else: done = store.update(code, advance, "resolution_result")
+            # 回傳值只在成功提交後取得，重試不會重複計數
+            if done:
+                with errors_lock: transitions[done] += 1
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(w,)) for w in range(threads)]
+    for t in pool: t.start()
+    for t in pool: t.join()
+    elapsed = time.perf_counter() - t0
+
+    for code, room in store.lobby_rooms():
+        if room["status"] != "lobby": errors.append(f"{code} 非招募中卻在索引內")
+    if store.stats["reaped"] or len(store) != rooms: errors.append(f"壓測期間清道夫誤刪 {rooms - len(store)} 個房間")
+    # 第二階段：縮短 TTL，所有房間 (無論狀態) 都應被清除
+    store.idle_ttl = store.finished_ttl = 0
+    time.sleep(0.05); store.reap()
+    if len(store): errors.append(f"清道夫後仍有 {len(store)} 個房間")
+    store.close()
+    logging.info(f"壓力測試 ({backend})：{threads} 執行緒 × {ops} 次操作，{elapsed:.2f} 秒 ({threads * ops / elapsed:,.0f} ops/秒)，"
+                 f"鎖定結算 {transitions['lock']} 次、推進回合 {transitions['advance']} 次、清除 {store.stats['reaped']} 房")
+    return errors
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="房間存放區壓力測試")
+    ap.add_argument("--backend", choices=BACKENDS, default="memory")
+    ap.add_argument("--threads", type=int, default=64)
+    ap.add_argument("--rooms", type=int, default=200)
+    ap.add_argument("--ops", type=int, default=2000)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [SECURE_LOG] - %(message)s')
+    errors = stress_test(args.threads, args.rooms, args.ops, backend=args.backend)
+    print("✅ 無違反不變量" if not errors else "❌ " + "\n".join(errors[:20]))
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
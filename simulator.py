@@ -0,0 +1,271 @@
+"""三國之巔 批次平衡模擬器。
+
+以 NumPy 批次重現 `score_round` 的計分語意，用於調整爆擊/險勝/完敗門檻與 pts_map：
+
+    python simulator.py --mode faction --games 200000
+    python simulator.py --mode ai --games 1000000 --crit-margin 25
+    python simulator.py --mode random --bench 5000000
+    python simulator.py --verify 200000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from game_rules import (
+    VALID_FACTIONS, TOTAL_ROUNDS, AI_PERSONALITIES, FACTION_ROSTERS, STAT_ATTRS, STATS_MATRIX, STATS_LOOKUP,
+    SCORING_RULES, general_rows, get_ai_cards_local, score_round
+)
+
+NUM_PLAYERS = len(VALID_FACTIONS)
+CARDS_PER_ROUND = 3
+BATCH_SIZE = 1 << 16
+MODES = ("random", "faction", "ai")
+
+# ==========================================
+# 🎲 向量化回合結算
+# ==========================================
+def score_rounds(totals, rules=SCORING_RULES):
+    """totals: (N, 4) 各玩家該回合屬性總和。回傳 (pts, ranks, crit, narrow, rout)。
+
+    名次以穩定排序決定，同分時座位在前者名次較前，與 `score_round` 的 sorted() 行為一致。
+    """
+    totals = np.asarray(totals, dtype=np.int64)
+    n = totals.shape[0]
+    order = np.argsort(-totals, axis=1, kind="stable")
+    ranked = np.take_along_axis(totals, order, axis=1)
+    diff_1_2 = ranked[:, 0] - ranked[:, 1]
+    diff_1_4 = ranked[:, 0] - ranked[:, 3]
+
+    crit = diff_1_2 > rules["crit_margin"]
+    narrow = ~crit & (diff_1_2 < rules["narrow_margin"])
+    rout = diff_1_4 > rules["rout_margin"]
+
+    pts_by_rank = np.broadcast_to(np.asarray(rules["base_points"], dtype=np.int64), (n, NUM_PLAYERS)).copy()
+    pts_by_rank[crit, 0] = rules["crit_points"]
+    pts_by_rank[narrow, 0] = rules["narrow_points"]
+    pts_by_rank[rout, 3] = rules["rout_points"]
+
+    rows = np.arange(n)[:, None]
+    pts = np.empty_like(pts_by_rank)
+    pts[rows, order] = pts_by_rank
+    ranks = np.empty_like(order)
+    ranks[rows, order] = np.arange(1, NUM_PLAYERS + 1)
+    return pts, ranks, crit, narrow, rout
+
+# ==========================================
+# 🃏 各模式的出戰陣容產生器 (回傳 (N, 回合, 玩家) 屬性總和)
+# ==========================================
+def _trio_totals(card_rows, attrs):
+    """card_rows: (N, 4, 回合, 3) 武將列索引；attrs: (N, 回合) 屬性索引。"""
+    return STATS_LOOKUP[card_rows, attrs[:, None, :, None]].sum(axis=3).transpose(0, 2, 1)
+
+def _sample_without_replacement(rng, shape, pool_size, k):
+    """對 shape 中每一格從 range(pool_size) 抽 k 個不重複索引，回傳 shape + (k,)。
+
+    第 j 次抽 [0, pool_size - j) 後，依序跳過已抽中的較小索引；k 很小時比對整個牌池做 argsort 快得多。
+    """
+    picks = np.empty(shape + (k,), dtype=np.intp)
+    for j in range(k):
+        x = rng.integers(0, pool_size - j, size=shape)
+        if j:
+            for prev in np.sort(picks[..., :j], axis=-1).transpose(-1, *range(len(shape))):
+                x += x >= prev
+        picks[..., j] = x
+    return picks
+
+def _shuffled_decks(rng, n, pools, rounds):
+    """每位玩家從自己的牌池中隨機抽出 rounds*3 張不重複武將，依序作為每回合出戰陣容。"""
+    pools = np.asarray(pools)                              # (4, P)
+    picks = _sample_without_replacement(rng, (n, NUM_PLAYERS), pools.shape[1], rounds * CARDS_PER_ROUND)
+    rows = pools[np.arange(NUM_PLAYERS)[None, :, None], picks]
+    return rows.reshape(n, NUM_PLAYERS, rounds, CARDS_PER_ROUND)
+
+def _ai_plan_table(rounds):
+    """AI 選將與屬性無關，預先算出 (陣營, 性格, 回合, 屬性) 的陣容總和表。"""
+    pers_names = list(AI_PERSONALITIES)
+    table = np.zeros((NUM_PLAYERS, len(pers_names), rounds, len(STAT_ATTRS)), dtype=np.int64)
+    for f, faction in enumerate(VALID_FACTIONS):
+        for p, pers in enumerate(pers_names):
+            deck = list(FACTION_ROSTERS[faction])
+            for r in range(rounds):
+                picks = get_ai_cards_local(deck, pers)
+                table[f, p, r] = STATS_LOOKUP[general_rows(picks)].sum(axis=0)
+                deck = [c for c in deck if c not in picks]
+    return table
+
+def generate_batch(rng, mode, n, rounds=TOTAL_ROUNDS, plan_table=None):
+    """回傳 (totals (N, R, 4), personalities (N, 4) 或 None)。"""
+    attrs = rng.integers(0, len(STAT_ATTRS), size=(n, rounds))
+    if mode == "random":
+        pool = np.arange(STATS_MATRIX.shape[0])
+        rows = _shuffled_decks(rng, n, [pool] * NUM_PLAYERS, rounds)
+        return _trio_totals(rows, attrs), None
+    if mode == "faction":
+        pools = [general_rows(FACTION_ROSTERS[f]) for f in VALID_FACTIONS]
+        rows = _shuffled_decks(rng, n, pools, rounds)
+        return _trio_totals(rows, attrs), None
+    if mode == "ai":
+        table = plan_table if plan_table is not None else _ai_plan_table(rounds)
+        pers = rng.integers(0, table.shape[1], size=(n, NUM_PLAYERS))
+        seat = np.arange(NUM_PLAYERS)[None, None, :]
+        rnd = np.arange(rounds)[None, :, None]
+        return table[seat, pers[:, None, :], rnd, attrs[:, :, None]], pers
+    raise ValueError(f"未知模擬模式: {mode}")
+
+# ==========================================
+# 📊 批次模擬與統計
+# ==========================================
+def simulate(mode="faction", games=100_000, rounds=TOTAL_ROUNDS, seed=None, rules=SCORING_RULES, batch_size=BATCH_SIZE):
+    """模擬 games 場完整對局 (每場 rounds 回合)，回傳統計報表 dict。"""
+    rng = np.random.default_rng(seed)
+    plan_table = _ai_plan_table(rounds) if mode == "ai" else None
+    n_pers = len(AI_PERSONALITIES)
+    # 單回合得分可能是任一條計分規則 (含險勝、完敗，自訂規則也可能為負)，直方圖須涵蓋全部範圍
+    points = [*rules["base_points"], rules["crit_points"], rules["narrow_points"], rules["rout_points"]]
+    min_score, max_score = rounds * min(points), rounds * max(points)
+    width = max_score - min_score + 1
+
+    wins = np.zeros(NUM_PLAYERS)
+    score_hist = np.zeros((NUM_PLAYERS, width), dtype=np.int64)
+    rank_counts = np.zeros((NUM_PLAYERS, NUM_PLAYERS), dtype=np.int64)
+    pers_wins, pers_games = np.zeros(n_pers), np.zeros(n_pers)
+    crit_n = narrow_n = rout_n = 0
+
+    done = 0
+    while done < games:
+        n = min(batch_size, games - done)
+        totals, pers = generate_batch(rng, mode, n, rounds, plan_table)
+        pts, ranks, crit, narrow, rout = score_rounds(totals.reshape(n * rounds, NUM_PLAYERS), rules)
+        crit_n += int(crit.sum()); narrow_n += int(narrow.sum()); rout_n += int(rout.sum())
+        for p in range(NUM_PLAYERS):
+            rank_counts[p] += np.bincount(ranks[:, p] - 1, minlength=NUM_PLAYERS)
+
+        final = pts.reshape(n, rounds, NUM_PLAYERS).sum(axis=1)
+        top = final == final.max(axis=1, keepdims=True)
+        share = top / top.sum(axis=1, keepdims=True)      # 同分並列第一時平分勝場
+        wins += share.sum(axis=0)
+        for p in range(NUM_PLAYERS):
+            score_hist[p] += np.bincount(final[:, p] - min_score, minlength=width)
+        if pers is not None:
+            pers_wins += np.bincount(pers.ravel(), weights=share.ravel(), minlength=n_pers)
+            pers_games += np.bincount(pers.ravel(), minlength=n_pers)
+        done += n
+
+    total_rounds = games * rounds
+    scores = np.arange(min_score, max_score + 1)
+    mean = score_hist @ scores / games
+    std = np.sqrt(score_hist @ scores ** 2 / games - mean ** 2)
+    cdf = np.cumsum(score_hist, axis=1) / games
+
+    win_table = pd.DataFrame({
+        "陣營": VALID_FACTIONS,
+        "勝率": wins / games,
+        "平均得分": mean,
+        "標準差": std,
+        "P10": min_score + (cdf < 0.10).sum(axis=1),
+        "P50": min_score + (cdf < 0.50).sum(axis=1),
+        "P90": min_score + (cdf < 0.90).sum(axis=1),
+    })
+    rank_table = pd.DataFrame(rank_counts / total_rounds, index=VALID_FACTIONS, columns=[f"第{i + 1}名" for i in range(NUM_PLAYERS)])
+    event_table = pd.DataFrame({
+        "事件": ["💥 爆擊", "😅 險勝", "💀 完敗"],
+        "次數": [crit_n, narrow_n, rout_n],
+        "頻率": [crit_n / total_rounds, narrow_n / total_rounds, rout_n / total_rounds],
+    })
+    report = {"wins": win_table, "ranks": rank_table, "events": event_table,
+              "score_hist": pd.DataFrame(score_hist, index=VALID_FACTIONS, columns=scores)}
+    if mode == "ai":
+        report["personalities"] = pd.DataFrame({
+            "性格": list(AI_PERSONALITIES),
+            "出場": pers_games.astype(np.int64),
+            "勝率": np.divide(pers_wins, pers_games, out=np.zeros(n_pers), where=pers_games > 0),
+        })
+    return report
+
+def benchmark(mode="random", rounds=2_000_000, seed=0, rules=SCORING_RULES):
+    """回傳 (產生陣容 + 結算) 與 (僅結算) 的每秒回合數。"""
+    rng = np.random.default_rng(seed)
+    plan_table = _ai_plan_table(1) if mode == "ai" else None
+    totals, _ = generate_batch(rng, mode, rounds, 1, plan_table)
+    totals = totals.reshape(rounds, NUM_PLAYERS)
+
+    t0 = time.perf_counter()
+    score_rounds(totals, rules)
+    score_only = rounds / (time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    done = 0
+    while done < rounds:
+        n = min(BATCH_SIZE, rounds - done)
+        batch, _ = generate_batch(rng, mode, n, 1, plan_table)
+        score_rounds(batch.reshape(n, NUM_PLAYERS), rules)
+        done += n
+    end_to_end = rounds / (time.perf_counter() - t0)
+    return end_to_end, score_only
+
+def verify(n=100_000, seed=0, rules=SCORING_RULES):
+    """以固定種子比對向量化結算與逐回合 `score_round`，回傳不一致的回合數 (應為 0)。"""
+    rng = np.random.default_rng(seed)
+    # 混入窄幅隨機總和以大量製造同分、恰好等於門檻的邊界情況
+    totals = np.concatenate([
+        generate_batch(rng, "random", n // 2, 1)[0].reshape(-1, NUM_PLAYERS),
+        rng.integers(150, 150 + 2 * rules["rout_margin"], size=(n - n // 2, NUM_PLAYERS)),
+    ])
+    pts, ranks, crit, narrow, rout = score_rounds(totals, rules)
+    mismatches = 0
+    for i, row in enumerate(totals.tolist()):
+        sorted_p, pts_map, status_msg, is_defeat = score_round(dict(enumerate(row)), rules)
+        for r, (p, _) in enumerate(sorted_p):
+            if pts[i, p] != pts_map[r] or ranks[i, p] != r + 1:
+                mismatches += 1
+                break
+        else:
+            if (bool(crit[i]), bool(narrow[i]), bool(rout[i])) != (status_msg.startswith("💥"), status_msg.startswith("😅"), is_defeat):
+                mismatches += 1
+    return mismatches
+
+# ==========================================
+# 🖥️ CLI
+# ==========================================
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="三國之巔 計分規則蒙地卡羅模擬器")
+    ap.add_argument("--mode", choices=MODES, default="faction", help="random: 全武將隨機抽牌；faction: 陣營牌組隨機出牌；ai: 四家皆為 AI 性格")
+    ap.add_argument("--games", type=int, default=100_000, help="模擬完整對局數")
+    ap.add_argument("--rounds", type=int, default=TOTAL_ROUNDS, help="每局回合數")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--bench", type=int, nargs="?", const=2_000_000, metavar="N", help="以 N 個回合量測每秒結算回合數")
+    ap.add_argument("--verify", type=int, metavar="N", help="與 score_round 逐回合比對 N 個種子回合")
+    for key in ("crit_margin", "crit_points", "narrow_margin", "narrow_points", "rout_margin", "rout_points"):
+        ap.add_argument(f"--{key.replace('_', '-')}", type=int, default=SCORING_RULES[key])
+    ap.add_argument("--base-points", type=int, nargs=NUM_PLAYERS, default=list(SCORING_RULES["base_points"]))
+    args = ap.parse_args(argv)
+
+    rules = {k: getattr(args, k) for k in SCORING_RULES}
+    rules["base_points"] = tuple(args.base_points)
+
+    if args.verify:
+        bad = verify(args.verify, args.seed or 0, rules)
+        print(f"比對 {args.verify} 回合：{'✅ 完全一致' if bad == 0 else f'❌ {bad} 回合不一致'}")
+        return 1 if bad else 0
+
+    if args.bench:
+        end_to_end, score_only = benchmark(args.mode, args.bench, args.seed or 0, rules)
+        print(f"模式 {args.mode}：含產生陣容 {end_to_end:,.0f} 回合/秒，僅結算 {score_only:,.0f} 回合/秒")
+        return 0
+
+    t0 = time.perf_counter()
+    report = simulate(args.mode, args.games, args.rounds, args.seed, rules)
+    elapsed = time.perf_counter() - t0
+    with pd.option_context("display.float_format", "{:.4f}".format, "display.unicode.east_asian_width", True):
+        print(f"🎲 模式 {args.mode}｜{args.games:,} 局 × {args.rounds} 回合｜{elapsed:.2f} 秒｜規則 {rules}\n")
+        print("🏆 勝率與得分分佈\n", report["wins"].to_string(index=False), "\n")
+        print("📊 回合名次分佈\n", report["ranks"].to_string(), "\n")
+        print("💥 特殊事件頻率\n", report["events"].to_string(index=False))
+        if "personalities" in report:
+            print("\n🎭 AI 性格勝率\n", report["personalities"].to_string(index=False))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
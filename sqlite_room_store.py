@@ -0,0 +1,200 @@
+"""SQLite (WAL) 房間存放區：多個 Streamlit 行程 / 副本共用同一份房間狀態，重啟後戰局不遺失。
+
+每個房間的頂層欄位 (players, decks, locked_cards, scores, ai_personalities, dialogue_vault, results...)
+各存一列 JSON；寫入時只更新有變動的欄位，並以房間版本號做樂觀並行控制。
+介面與 `RoomStore` 相同，由 `room_store.create_room_store()` 依設定選用。
+"""
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from room_store import IDLE_TTL, FINISHED_TTL, REAP_INTERVAL, new_room
+
+DEFAULT_DB_PATH = os.getenv("ROOM_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "rooms.sqlite3"))
+MAX_RETRIES = 20
+TOUCH_INTERVAL = 60        # 秒；單純讀取時最多每分鐘更新一次活動時間，避免每次重繪都寫入
+
+class RoomConflictError(RuntimeError):
+    pass
+
+class SqliteRoomStore:
+    def __init__(self, db_path=DEFAULT_DB_PATH, idle_ttl=IDLE_TTL, finished_ttl=FINISHED_TTL, reap_interval=REAP_INTERVAL):
+        self.db_path, self.idle_ttl, self.finished_ttl = db_path, idle_ttl, finished_ttl
+        self._local = threading.local()
+        self._last_touch = {}
+        self.stats = {"created": 0, "reaped": 0, "conflicts": 0}
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        db = self._conn()
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS rooms (
+                code TEXT PRIMARY KEY, status TEXT NOT NULL, version INTEGER NOT NULL,
+                created_at REAL NOT NULL, touched_at REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS idx_rooms_status ON rooms (status);
+            CREATE TABLE IF NOT EXISTS room_fields (
+                code TEXT NOT NULL REFERENCES rooms (code) ON DELETE CASCADE, field TEXT NOT NULL, value TEXT NOT NULL,
+                PRIMARY KEY (code, field)) WITHOUT ROWID;
+        """)
+        if reap_interval:
+            self._stop = threading.Event()
+            threading.Thread(target=self._reap_loop, args=(reap_interval,), daemon=True, name="room-reaper").start()
+
+    def _conn(self):
+        # sqlite3 連線不可跨執行緒共用，每個執行緒各開一條
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            self._local.db = db
+        return db
+
+    # ---------- 讀取 ----------
+    def _load(self, code):
+        """回傳 (room, version, 各欄位序列化字串)；房間不存在回傳 (None, None, None)。"""
+        db = self._conn()
+        db.execute("BEGIN")
+        try:
+            row = db.execute("SELECT status, version FROM rooms WHERE code = ?", (code,)).fetchone()
+            if row is None: return None, None, None
+            fields = dict(db.execute("SELECT field, value FROM room_fields WHERE code = ?", (code,)).fetchall())
+        finally:
+            db.execute("COMMIT")
+        room = {k: json.loads(v) for k, v in fields.items()}
+        room["status"] = row[0]
+        return room, row[1], fields
+
+    def get(self, code):
+        return self.snapshot(code)[1]
+
+    def snapshot(self, code):
+        # 版本號與欄位在同一個讀取交易內取得，彼此一致
+        room, version, _ = self._load(code)
+        if room is None: return None, None
+        self._touch(code)
+        return version, room
+
+    def _touch(self, code):
+        now = time.time()
+        if now - self._last_touch.get(code, 0) < TOUCH_INTERVAL: return
+        self._last_touch[code] = now
+        self._conn().execute("UPDATE rooms SET touched_at = ? WHERE code = ?", (now, code))
+
+    def version(self, code):
+        row = self._conn().execute("SELECT version FROM rooms WHERE code = ?", (code,)).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, code):
+        return self._conn().execute("SELECT 1 FROM rooms WHERE code = ?", (code,)).fetchone() is not None
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM rooms").fetchone()[0]
+
+    def lobby_rooms(self):
+        codes = [c for (c,) in self._conn().execute("SELECT code FROM rooms WHERE status = 'lobby' ORDER BY code").fetchall()]
+        return [(c, r) for c in codes if (r := self._load(c)[0]) is not None and r["status"] == "lobby"]
+
+    def count_by_status(self):
+        return dict(self._conn().execute("SELECT status, COUNT(*) FROM rooms GROUP BY status").fetchall())
+
+    # ---------- 寫入 ----------
+    def create(self, room=None):
+        room = room if room is not None else new_room()
+        db, now = self._conn(), time.time()
+        while True:
+            code = secrets.token_hex(3).upper()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("INSERT INTO rooms (code, status, version, created_at, touched_at) VALUES (?, ?, 0, ?, ?)", (code, room["status"], now, now))
+                db.executemany("INSERT INTO room_fields (code, field, value) VALUES (?, ?, ?)",
+                               [(code, k, json.dumps(v, ensure_ascii=False)) for k, v in room.items() if k != "status"])
+                db.execute("COMMIT")
+                break
+            except sqlite3.IntegrityError:
+                db.execute("ROLLBACK")       # 房間代碼撞號，換一個重試
+            except Exception:
+                # 其他錯誤 (例如等待逾時後仍 database is locked) 也要結束交易，否則這條連線之後的 BEGIN 全部失敗
+                db.execute("ROLLBACK")
+                raise
+        self.stats["created"] += 1
+        return code
+
+    def _commit(self, code, version, before, prev_status, room):
+        """只寫入變動過的欄位；版本號不符 (其他行程已先寫入) 時回傳 False。"""
+        after = {k: json.dumps(v, ensure_ascii=False) for k, v in room.items() if k != "status"}
+        changed = [(code, k, v) for k, v in after.items() if before.get(k) != v]
+        removed = [(code, k) for k in before if k not in after]
+        db, now = self._conn(), time.time()
+        # 完全沒有變動時不寫入也不遞增版本號，避免等待中的玩家無謂重繪
+        if not changed and not removed and room["status"] == prev_status:
+            return db.execute("SELECT 1 FROM rooms WHERE code = ? AND version = ?", (code, version)).fetchone() is not None
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            cur = db.execute("UPDATE rooms SET version = version + 1, status = ?, touched_at = ? WHERE code = ? AND version = ?",
+                             (room["status"], now, code, version))
+            if cur.rowcount == 0:
+                db.execute("ROLLBACK")
+                return False
+            if changed: db.executemany("INSERT OR REPLACE INTO room_fields (code, field, value) VALUES (?, ?, ?)", changed)
+            if removed: db.executemany("DELETE FROM room_fields WHERE code = ? AND field = ?", removed)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self._last_touch[code] = now
+        return True
+
+    @contextmanager
+    def mutate(self, code, expect_status=None):
+        """樂觀並行：讀取快照後修改，提交時若已被其他行程搶先寫入則拋出 RoomConflictError。
+
+        需要自動重試時請改用 `update()`。
+        """
+        room, version, before = self._load(code)
+        if room is None or (expect_status is not None and room["status"] != expect_status):
+            yield None
+            return
+        prev_status = room["status"]
+        yield room
+        if not self._commit(code, version, before, prev_status, room):
+            self.stats["conflicts"] += 1
+            raise RoomConflictError(f"房間 {code} 已被其他連線更新")
+
+    def update(self, code, fn, expect_status=None):
+        for _ in range(MAX_RETRIES):
+            room, version, before = self._load(code)
+            if room is None or (expect_status is not None and room["status"] != expect_status): return None
+            prev_status = room["status"]
+            result = fn(room)
+            if self._commit(code, version, before, prev_status, room): return result
+            self.stats["conflicts"] += 1
+        raise RoomConflictError(f"房間 {code} 更新衝突次數過多")
+
+    def remove(self, code):
+        room = self._load(code)[0]
+        self._conn().execute("DELETE FROM rooms WHERE code = ?", (code,))
+        self._last_touch.pop(code, None)
+        return room
+
+    # ---------- 清道夫 ----------
+    def reap(self, now=None):
+        now = time.time() if now is None else now
+        cur = self._conn().execute("DELETE FROM rooms WHERE touched_at < CASE WHEN status = 'finished' THEN ? ELSE ? END",
+                                   (now - self.finished_ttl, now - self.idle_ttl))
+        removed = cur.rowcount
+        self.stats["reaped"] += removed
+        if removed: logging.info(f"房間清道夫：移除 {removed} 個閒置房間")
+        return removed
+
+    def _reap_loop(self, interval):
+        while not self._stop.wait(interval):
+            try: self.reap()
+            except Exception as e: logging.error(f"房間清道夫失敗: {e}")
+
+    def close(self):
+        if hasattr(self, "_stop"): self._stop.set()
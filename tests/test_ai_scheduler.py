@@ -0,0 +1,109 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import ai_scheduler
+from ai_scheduler import FAILURE_THRESHOLD, HedgedScheduler
+
+HEDGE_DELAY = 0.1
+
+@pytest.fixture(autouse=True)
+def fast_timings(monkeypatch):
+    monkeypatch.setattr(ai_scheduler, "DEFAULT_HEDGE_DELAY", HEDGE_DELAY)
+    monkeypatch.setattr(ai_scheduler, "COOLDOWN", 0.2)
+
+@pytest.fixture
+def release():
+    # 卡住的假供應商等待這個事件；測試結束時放行，不留下懸掛的執行緒
+    event = threading.Event()
+    yield event
+    event.set()
+
+class FakeProvider:
+    def __init__(self, reply='{"ok": 1}', delay=0.0, error=None, hang=None):
+        self.reply, self.delay, self.error, self.hang = reply, delay, error, hang
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self._lock: self.calls += 1
+        if self.hang is not None: self.hang.wait(5)
+        time.sleep(self.delay)
+        if self.error: raise RuntimeError(self.error)
+        return self.reply
+
+def test_fast_primary_is_not_hedged():
+    primary, backup = FakeProvider(), FakeProvider()
+    sched = HedgedScheduler([("primary", primary), ("backup", backup)])
+    assert sched.call("p") == ('{"ok": 1}', "primary")
+    time.sleep(HEDGE_DELAY * 2)
+    assert backup.calls == 0
+
+def test_slow_primary_is_hedged_after_delay(release):
+    primary, backup = FakeProvider(hang=release), FakeProvider(reply="backup")
+    sched = HedgedScheduler([("primary", primary), ("backup", backup)])
+    t0 = time.monotonic()
+    assert sched.call("p") == ("backup", "backup")
+    elapsed = time.monotonic() - t0
+    assert HEDGE_DELAY <= elapsed < HEDGE_DELAY + 0.3
+
+def test_hedges_fire_on_time_under_concurrent_calls(release):
+    # 10 個同時的呼叫全卡在首選供應商上，對沖請求仍應在延遲後立即送出，而不是排在卡住的請求後面
+    primary, backup = FakeProvider(hang=release), FakeProvider(reply="backup")
+    sched = HedgedScheduler([("primary", primary), ("backup", backup)], concurrent_calls=10)
+
+    def timed_call(_):
+        t0 = time.monotonic()
+        return sched.call("p"), time.monotonic() - t0
+
+    with ThreadPoolExecutor(10) as pool: results = list(pool.map(timed_call, range(10)))
+    assert all(r == ("backup", "backup") for r, _ in results)
+    assert max(t for _, t in results) < HEDGE_DELAY + 0.5
+
+def test_invalid_reply_falls_through_to_next_provider():
+    primary, backup = FakeProvider(reply="not json"), FakeProvider(reply="{}")
+    sched = HedgedScheduler([("primary", primary), ("backup", backup)])
+    assert sched.call("p", validate=lambda t: t.startswith("{")) == ("{}", "backup")
+
+def test_all_providers_failing_raises():
+    providers = [(f"p{i}", FakeProvider(error=f"boom {i}")) for i in range(3)]
+    sched = HedgedScheduler(providers)
+    with pytest.raises(RuntimeError, match="所有 AI 服務暫不可用"):
+        sched.call("p")
+    assert [fn.calls for _, fn in providers] == [1, 1, 1]
+
+def test_deadline_bounds_hung_providers(release):
+    providers = [(f"p{i}", FakeProvider(hang=release)) for i in range(3)]
+    sched = HedgedScheduler(providers)
+    t0 = time.monotonic()
+    with pytest.raises(RuntimeError, match="等待逾時"):
+        sched.call("p", timeout=0.3)
+    assert time.monotonic() - t0 < 0.6
+
+def test_breaker_opens_then_half_opens_for_one_probe():
+    bad, good = FakeProvider(error="down"), FakeProvider(reply="good")
+    sched = HedgedScheduler([("bad", bad), ("good", good)])
+    for _ in range(FAILURE_THRESHOLD): assert sched.call("p") == ("good", "good")
+    assert bad.calls == FAILURE_THRESHOLD
+    assert not sched.health["bad"].available()
+
+    # 斷路期間直接略過
+    sched.call("p")
+    assert bad.calls == FAILURE_THRESHOLD
+
+    # 冷卻後半開：只放行一個試探請求；試探失敗再次斷路
+    time.sleep(ai_scheduler.COOLDOWN + 0.05)
+    health = sched.health["bad"]
+    assert health.available()
+    health.begin()
+    assert not health.available()
+    health.record(0.01, False)
+    assert not health.available()
+
+    # 再次冷卻後試探成功即恢復
+    time.sleep(ai_scheduler.COOLDOWN + 0.05)
+    bad.error, bad.reply = None, "recovered"
+    assert sched.call("p") == ("recovered", "bad")
+    assert health.available() and health.consecutive_failures == 0
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from llm_clients import ClientPool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KEYS = {"gemini": "g-key", "groq": "q-key", "grok": None}
+
+@pytest.fixture
+def pool(monkeypatch):
+    sentinel = object()
+    monkeypatch.setattr(ClientPool, "_build", lambda self, provider: sentinel)
+    return ClientPool(KEYS), sentinel
+
+def test_concurrent_first_calls_build_one_client(pool):
+    pool, sentinel = pool
+    start, results = threading.Barrier(32), []
+    def first_call():
+        start.wait()
+        results.append(pool.get("groq"))
+    threads = [threading.Thread(target=first_call) for _ in range(32)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(results) == 32 and all(r is sentinel for r in results)
+    assert pool.constructions["groq"] == 1
+    assert pool.get("groq") is sentinel and pool.constructions["groq"] == 1
+    assert pool.constructions["gemini"] == 0
+
+def test_unconfigured_provider_raises(pool):
+    pool, _ = pool
+    assert not pool.configured("grok")
+    with pytest.raises(KeyError):
+        pool.get("grok")
+    with pytest.raises(KeyError):
+        pool.get("unknown")
+    assert pool.summary()["grok"] == {"configured": False, "built": False, "constructions": 0}
+
+def test_sdks_are_not_imported_before_first_get():
+    # 另開行程：本行程中其他測試可能已匯入過 SDK
+    code = """
+import sys
+import ai_engine
+from llm_clients import ClientPool
+heavy = ("google.genai", "openai", "httpx")
+assert not [m for m in heavy if m in sys.modules], [m for m in heavy if m in sys.modules]
+ClientPool._build = lambda self, provider: object()
+pool = ClientPool({"groq": "key"}); pool.get("groq")
+assert not [m for m in heavy if m in sys.modules]
+"""
+    env = dict(os.environ, GEMINI_API_KEY="g", GROQ_API_KEY="q", GROK_API_KEY="x")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
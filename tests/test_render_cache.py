@@ -0,0 +1,43 @@
+import pytest
+
+from engine import GameEngine
+from render_cache import RenderCache
+from room_store import create_room_store
+
+@pytest.fixture(params=["memory", "sqlite"])
+def engine(request, tmp_path):
+    store = create_room_store(request.param, db_path=str(tmp_path / "rooms.sqlite3"), reap_interval=0)
+    yield GameEngine(store)
+    store.close()
+
+def play_to_result(engine, code):
+    engine.lock_cards(code, "hero", engine.get(code)["decks"]["hero"][:3])
+    assert engine.resolve(code)
+
+def test_snapshot_version_matches_room(engine):
+    code = engine.create_room()
+    assert engine.snapshot("NOPE") == (None, None)
+    engine.join(code, "hero", "蜀"); engine.start(code, "hero")
+    version, room = engine.snapshot(code)
+    assert version == engine.version(code) and room["status"] == "playing"
+    play_to_result(engine, code)
+    later, room = engine.snapshot(code)
+    assert later > version and room["status"] == "resolution_result"
+
+def test_render_cache_keys_follow_snapshot_version(engine):
+    code = engine.create_room()
+    engine.join(code, "hero", "蜀"); engine.start(code, "hero")
+    play_to_result(engine, code)
+    cache = RenderCache()
+    v1, room1 = engine.snapshot(code)
+    board1 = cache.scoreboard(code, v1, room1)
+
+    # 房間推進一整回合後，新版本取得新的結果；舊版本仍對應舊快照
+    engine.next_round(code)
+    play_to_result(engine, code)
+    v2, room2 = engine.snapshot(code)
+    assert v2 != v1 and room2["round"] == room1["round"] + 1
+    hero_cards = lambda v, room: next(r["cards"] for p, r, _ in cache.ranked_results(code, v, room) if p == "hero")
+    assert hero_cards(v1, room1) != hero_cards(v2, room2)
+    assert cache.scoreboard(code, v1, room1) is board1
+    assert [r["總分"] for r in cache.scoreboard(code, v2, room2)] == sorted(room2["scores"].values(), reverse=True)
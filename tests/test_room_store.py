@@ -0,0 +1,66 @@
+import random
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from engine import CARDS_PER_ROUND, GameEngine
+from game_rules import VALID_FACTIONS, TOTAL_ROUNDS, FACTION_ROSTERS
+from room_store import BACKENDS, create_room_store, stress_test
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_stress_test_has_no_violations(backend):
+    assert stress_test(threads=16, rooms=50, ops=500, backend=backend) == []
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_engine_transitions_under_contention(backend, tmp_path):
+    """每房四位真人玩家各一個執行緒：同時搶陣營、同時按開始、結算與下一回合，引擎每步只能接受一次。"""
+    store = create_room_store(backend, db_path=str(tmp_path / "rooms.sqlite3"), reap_interval=0)
+    engine = GameEngine(store, rng=random.Random(0))
+    codes = [engine.create_room() for _ in range(12)]
+    counts, counts_lock, errors = Counter(), threading.Lock(), []
+    barriers = {code: threading.Barrier(len(VALID_FACTIONS)) for code in codes}
+    deadline = time.monotonic() + 30   # 轉換出錯時房間可能永遠不會結束，不讓測試卡住
+
+    def record(code, op, ok):
+        if ok:
+            with counts_lock: counts[code, op] += 1
+
+    def player(code, seat):
+        rng, pid = random.Random(f"{code}-{seat}"), f"p{seat}"
+        try:
+            for faction in rng.sample(VALID_FACTIONS, len(VALID_FACTIONS)):
+                if engine.join(code, pid, faction): record(code, "join", True); break
+            barriers[code].wait()
+            record(code, "start", engine.start(code, pid))
+            while True:
+                if time.monotonic() > deadline: raise TimeoutError(f"{code} 未在期限內結束")
+                room = engine.get(code)
+                status = room["status"]
+                if status == "finished": return
+                if status == "playing" and pid not in room["locked_cards"]:
+                    record(code, "lock", engine.lock_cards(code, pid, rng.sample(room["decks"][pid], CARDS_PER_ROUND)))
+                elif status == "resolution_pending": record(code, "resolve", engine.resolve(code))
+                elif status == "resolution_result": record(code, "next", engine.next_round(code))
+                else: time.sleep(0.001)   # 已鎖定，等其他玩家
+        except Exception as e:
+            errors.append(e)
+            barriers[code].abort()
+
+    threads = [threading.Thread(target=player, args=(code, seat)) for code in codes for seat in range(len(VALID_FACTIONS))]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    store.close()
+    assert not errors, errors[0]
+    for code in codes:
+        version, room = engine.snapshot(code)
+        assert room["status"] == "finished" and room["round"] == TOTAL_ROUNDS
+        assert sorted(room["players"].values()) == sorted(VALID_FACTIONS) and not room["ai_factions"]
+        for pid, faction in room["players"].items():
+            assert len(room["decks"][pid]) == len(FACTION_ROSTERS[faction]) - CARDS_PER_ROUND * TOTAL_ROUNDS
+        expected = {"join": len(VALID_FACTIONS), "start": 1, "lock": len(VALID_FACTIONS) * TOTAL_ROUNDS,
+                    "resolve": TOTAL_ROUNDS, "next": TOTAL_ROUNDS}
+        assert {op: counts[code, op] for op in expected} == expected
+        # 每次成功的轉換恰好遞增一次版本號，被拒絕的操作不遞增
+        assert version == sum(expected.values())
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from game_rules import SCORING_RULES, score_round
+from simulator import NUM_PLAYERS, score_rounds, simulate, verify
+
+CUSTOM_RULES = [
+    SCORING_RULES,
+    dict(SCORING_RULES, narrow_points=20),
+    dict(SCORING_RULES, crit_margin=10, crit_points=12, narrow_margin=8, rout_margin=25, rout_points=-3),
+    dict(SCORING_RULES, base_points=(9, 4, 1, 0), narrow_margin=0, rout_points=2),
+]
+
+@pytest.mark.parametrize("rules", CUSTOM_RULES)
+def test_vectorized_scoring_matches_score_round(rules):
+    assert verify(20_000, seed=7, rules=rules) == 0
+
+def test_ties_and_exact_margins():
+    # 同分、恰好等於門檻：名次依座位順序，門檻以嚴格大於 / 小於判定
+    rows = [[100, 100, 100, 100], [130, 100, 90, 40], [131, 100, 90, 70], [104, 100, 100, 99], [105, 100, 100, 44]]
+    pts, ranks, *_ = score_rounds(rows)
+    for i, row in enumerate(rows):
+        sorted_p, pts_map, _, _ = score_round(dict(enumerate(row)))
+        for r, (p, _) in enumerate(sorted_p):
+            assert (pts[i, p], ranks[i, p]) == (pts_map[r], r + 1)
+
+@pytest.mark.parametrize("rules", CUSTOM_RULES)
+def test_score_histogram_keeps_every_game(rules):
+    games, rounds = 3_000, 5
+    report = simulate("random", games=games, rounds=rounds, seed=1, rules=rules)
+    hist = report["score_hist"]
+    assert (hist.sum(axis=1) == games).all()
+    points = [*rules["base_points"], rules["crit_points"], rules["narrow_points"], rules["rout_points"]]
+    assert hist.columns.min() == rounds * min(points) and hist.columns.max() == rounds * max(points)
+    mean = hist.to_numpy() @ hist.columns.to_numpy() / games
+    np.testing.assert_allclose(report["wins"]["平均得分"], mean)
+    assert report["ranks"].shape == (NUM_PLAYERS, NUM_PLAYERS)
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from sqlite_room_store import RoomConflictError, SqliteRoomStore
+
+@pytest.fixture
+def stores(tmp_path):
+    # 兩個實例共用同一個資料庫檔，如同兩個 Streamlit 行程 / 副本
+    path = str(tmp_path / "rooms.sqlite3")
+    a, b = SqliteRoomStore(path, reap_interval=0), SqliteRoomStore(path, reap_interval=0)
+    yield a, b
+    a.close(); b.close()
+
+def test_failed_create_rolls_back_and_connection_stays_usable(stores):
+    store, _ = stores
+    with pytest.raises(TypeError):
+        store.create({"status": "lobby", "players": {1, 2}})    # set 無法序列化，失敗在交易中途
+    assert len(store) == 0
+    code = store.create()
+    assert store.get(code)["status"] == "lobby" and len(store) == 1
+
+def test_update_retries_after_another_instance_commits(stores):
+    a, b = stores
+    code = a.create()
+    calls = []
+
+    def join_hero(room):
+        calls.append(dict(room["players"]))
+        # 第一次執行時，另一個實例搶先寫入同一房間
+        if len(calls) == 1: b.update(code, lambda r: r["players"].update(rival="魏"))
+        room["players"]["hero"] = "蜀"
+        return True
+
+    assert a.update(code, join_hero) is True
+    assert calls == [{}, {"rival": "魏"}]               # 第一次提交因版本號不符而重試，第二次讀到對方的修改
+    assert a.stats["conflicts"] == 1 and b.stats["conflicts"] == 0
+    assert b.get(code)["players"] == {"rival": "魏", "hero": "蜀"}
+    assert a.version(code) == b.version(code) == 2
+
+def test_mutate_raises_on_conflict(stores):
+    a, b = stores
+    code = a.create()
+    with pytest.raises(RoomConflictError):
+        with a.mutate(code) as room:
+            b.update(code, lambda r: r["scores"].update(rival=1))
+            room["scores"]["hero"] = 1
+    assert a.get(code)["scores"] == {"rival": 1}
+
+def test_concurrent_updates_from_two_instances_lose_nothing(stores):
+    a, b = stores
+    code = a.create()
+
+    def bump(store, pid):
+        for _ in range(25):
+            store.update(code, lambda r: r["scores"].__setitem__(pid, r["scores"].get(pid, 0) + 1))
+
+    threads = [threading.Thread(target=bump, args=(s, f"p{i}")) for i, s in enumerate([a, b, a, b])]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert a.get(code)["scores"] == {f"p{i}": 25 for i in range(4)}
+    assert a.version(code) == 100
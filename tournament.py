@@ -0,0 +1,177 @@
+"""AI 對 AI 錦標賽：以行程池在所有核心上平行跑完整四人對局，串流寫出逐局結果並維護 Elo 排行榜。
+
+- 每局四個陣營 (VALID_FACTIONS / FACTION_ROSTERS) 各由一位參賽者操作，回合結算沿用 `engine.apply_round`
+- 參賽者 = 選將法 (greedy: `get_ai_cards_local`；lookahead[:性格加權]: `planner.LookaheadPlanner`) + AI 性格
+- 對局分批交給行程池；每批的亂數由 (種子, 批次編號) 決定，結果與核心數無關，同種子必定重現
+- 每批完成即寫出一個 CSV / Parquet 分塊；Elo 依對局編號順序更新，同樣可重現
+
+    python tournament.py --games 20000 --workers 8 --out .cache/tournament
+    python tournament.py --entrants greedy/神算子 lookahead/神算子 lookahead:1.0/霸道梟雄 greedy/守護之盾 --format parquet
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from engine import apply_round
+from game_rules import VALID_FACTIONS, TOTAL_ROUNDS, AI_PERSONALITIES, FACTION_ROSTERS, STAT_ATTRS, get_ai_cards_local
+from room_store import new_room
+
+ALGORITHMS = ("greedy", "lookahead")
+FORMATS = ("csv", "parquet")
+CHUNK_GAMES = 250          # 每個行程池工作的對局數；也是輸出分塊的大小
+ELO_START = 1500.0
+ELO_K = 16.0
+DEFAULT_OUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "tournament")
+
+def parse_entrant(spec):
+    """'lookahead:1.0/神算子' -> ('lookahead', 1.0, '【神算子】')；省略加權時使用 planner 預設值。"""
+    algo, _, pers = spec.partition("/")
+    algo, _, bias = algo.partition(":")
+    if algo not in ALGORITHMS: raise ValueError(f"未知選將法: {algo}")
+    names = [p for p in AI_PERSONALITIES if pers and pers.strip("【】") == p.strip("【】")]
+    if not names: raise ValueError(f"未知 AI 性格: {pers}")
+    return algo, float(bias) if bias else None, names[0]
+
+def entrant_name(algo, bias, pers):
+    return f"{algo}{'' if bias is None else f':{bias:g}'}/{pers}"
+
+DEFAULT_ENTRANTS = [entrant_name(a, None, p) for a in ALGORITHMS for p in AI_PERSONALITIES]
+
+# ==========================================
+# ⚔️ 對局 (在工作行程內執行)
+# ==========================================
+_PLANNERS = {}
+
+def _picker(algo, bias):
+    if algo == "greedy": return lambda deck, pers, left: get_ai_cards_local(deck, pers)
+    if bias not in _PLANNERS:
+        from planner import PERSONALITY_BIAS, LookaheadPlanner
+        # 不設時間預算：超時改用貪婪會讓結果隨機器負載而變，無法重現
+        planner = LookaheadPlanner(time_budget=float("inf"), bias=PERSONALITY_BIAS if bias is None else bias)
+        planner.warm()
+        _PLANNERS[bias] = planner
+    return _PLANNERS[bias].choose
+
+def play_game(entrants, rng):
+    """entrants: 四個 (algo, bias, personality)，依 VALID_FACTIONS 順序入座。回傳 (各座總分, 各回合屬性)。"""
+    room = new_room()
+    pickers = {}
+    for faction, (algo, bias, pers) in zip(VALID_FACTIONS, entrants):
+        pid = f"AI_{faction}"
+        room["ai_factions"].append(faction)
+        room["decks"][pid], room["scores"][pid], room["ai_personalities"][pid] = list(FACTION_ROSTERS[faction]), 0, pers
+        pickers[pid] = _picker(algo, bias)
+    attrs = []
+    for rnd in range(1, TOTAL_ROUNDS + 1):
+        room["round"] = rnd
+        room["locked_cards"] = {pid: pick(room["decks"][pid], room["ai_personalities"][pid], TOTAL_ROUNDS - rnd + 1)
+                                for pid, pick in pickers.items()}
+        attr = STAT_ATTRS[rng.integers(len(STAT_ATTRS))]
+        apply_round(room, attr)
+        attrs.append(attr)
+    return [room["scores"][f"AI_{f}"] for f in VALID_FACTIONS], attrs
+
+def play_chunk(seed, chunk, first_game, games, pool):
+    """同一批的對局：由 (seed, chunk) 決定亂數，回傳逐局結果 DataFrame。"""
+    rng = np.random.default_rng([seed, chunk])
+    parsed = [parse_entrant(e) for e in pool]
+    rows = []
+    for g in range(first_game, first_game + games):
+        # 參賽者多於四位時不重複抽選；座位 (陣營) 順序即抽出順序
+        seats = rng.choice(len(pool), size=len(VALID_FACTIONS), replace=len(pool) < len(VALID_FACTIONS))
+        scores, attrs = play_game([parsed[s] for s in seats], rng)
+        row = {"game": g}
+        for faction, s, pts in zip(VALID_FACTIONS, seats, scores):
+            row[f"entrant_{faction}"], row[f"points_{faction}"] = int(s), pts
+        row["attrs"] = "".join(a[0] for a in attrs)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+# ==========================================
+# 📈 Elo 排行榜 (在主行程依對局順序更新)
+# ==========================================
+class EloLadder:
+    def __init__(self, names, start=ELO_START, k=ELO_K):
+        self.names, self.k = list(names), k
+        self.rating = np.full(len(names), start)
+        self.games, self.wins, self.points = (np.zeros(len(names)) for _ in range(3))
+
+    def record(self, seats, points):
+        """多人對局拆成兩兩比較：總分高者得 1、同分各得 0.5，每對的 K 值除以 (人數 - 1)。"""
+        seats, points = np.asarray(seats), np.asarray(points, dtype=float)
+        r = self.rating[seats]
+        expected = 1 / (1 + 10 ** ((r[None, :] - r[:, None]) / 400))
+        actual = (points[:, None] > points[None, :]) + 0.5 * (points[:, None] == points[None, :])
+        np.fill_diagonal(expected, 0); np.fill_diagonal(actual, 0)
+        delta = self.k / (len(seats) - 1) * (actual - expected).sum(axis=1)
+        np.add.at(self.rating, seats, delta)
+        top = points == points.max()
+        np.add.at(self.games, seats, 1)
+        np.add.at(self.wins, seats, top / top.sum())
+        np.add.at(self.points, seats, points)
+
+    def record_frame(self, df):
+        seats = df[[f"entrant_{f}" for f in VALID_FACTIONS]].to_numpy()
+        points = df[[f"points_{f}" for f in VALID_FACTIONS]].to_numpy()
+        for s, p in zip(seats, points): self.record(s, p)
+
+    def table(self):
+        played = np.maximum(self.games, 1)
+        df = pd.DataFrame({"參賽者": self.names, "Elo": self.rating.round(1), "對局": self.games.astype(int),
+                           "勝率": self.wins / played, "平均總分": self.points / played})
+        return df.sort_values("Elo", ascending=False, ignore_index=True)
+
+# ==========================================
+# 🏟️ 錦標賽
+# ==========================================
+def write_chunk(df, out_dir, chunk, fmt):
+    path = os.path.join(out_dir, f"games-{chunk:05d}.{fmt}")
+    if fmt == "parquet": df.to_parquet(path, index=False)     # 需要 pyarrow
+    else: df.to_csv(path, index=False)
+    return path
+
+def run(games=10_000, entrants=DEFAULT_ENTRANTS, seed=0, workers=None, out_dir=DEFAULT_OUT, fmt="csv", chunk_games=CHUNK_GAMES):
+    entrants = [entrant_name(*parse_entrant(e)) for e in entrants]
+    if len(set(entrants)) != len(entrants): raise ValueError("參賽者重複")
+    workers = workers or os.cpu_count() or 1
+    if out_dir: os.makedirs(out_dir, exist_ok=True)
+    ladder = EloLadder(entrants)
+    chunks = [(c, c * chunk_games, min(chunk_games, games - c * chunk_games)) for c in range(-(-games // chunk_games))]
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 全部送出後依序取回：分塊一完成即寫檔，Elo 依對局編號順序更新
+        futures = [pool.submit(play_chunk, seed, c, first, n, entrants) for c, first, n in chunks]
+        for (c, _, _), fut in zip(chunks, futures):
+            df = fut.result()
+            if out_dir: write_chunk(df, out_dir, c, fmt)
+            ladder.record_frame(df)
+    elapsed = time.perf_counter() - t0
+
+    table = ladder.table()
+    if out_dir: table.to_csv(os.path.join(out_dir, "ladder.csv"), index=False)
+    return {"games": games, "workers": workers, "elapsed": elapsed, "games_per_sec": games / elapsed, "ladder": table}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="三國之巔 AI 對 AI 錦標賽")
+    ap.add_argument("--games", type=int, default=10_000)
+    ap.add_argument("--entrants", nargs="+", default=DEFAULT_ENTRANTS, help="選將法[:性格加權]/性格，例如 lookahead:1.0/神算子")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=None, help="行程數 (預設為核心數)")
+    ap.add_argument("--out", default=DEFAULT_OUT, help="逐局結果與排行榜的輸出目錄")
+    ap.add_argument("--format", choices=FORMATS, default="csv")
+    ap.add_argument("--chunk", type=int, default=CHUNK_GAMES, help="每個分塊的對局數")
+    args = ap.parse_args(argv)
+
+    r = run(args.games, args.entrants, args.seed, args.workers, args.out, args.format, args.chunk)
+    print(f"🏟️ {r['games']:,} 局｜{r['workers']} 行程｜{r['elapsed']:.2f} 秒 ({r['games_per_sec']:,.0f} 局/秒)｜輸出 {args.out}")
+    with pd.option_context("display.float_format", "{:.3f}".format, "display.unicode.east_asian_width", True):
+        print(r["ladder"].to_string(index=False))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
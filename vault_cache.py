@@ -0,0 +1,159 @@
+"""AI 台詞庫 (dialogue vault) 兩層快取：行程內 LRU + 磁碟 SQLite。
+
+台詞庫只取決於出場的 AI 性格組合，因此以「排序去重後的性格集合」為鍵，每組保存數個版本輪替使用；
+遊戲開局時以單一性格為單位查詢與生成。離線預熱 (每個性格各生成數個版本)：
+
+    python vault_cache.py --prewarm --variants 3
+    python vault_cache.py --stats
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from game_rules import AI_PERSONALITIES, STAT_ATTRS
+
+DEFAULT_DB_PATH = os.getenv("VAULT_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "dialogue_vaults.sqlite3"))
+DEFAULT_TTL = 7 * 24 * 3600      # 秒；台詞過期後自動淘汰，讓內容保持新鮮
+MAX_VARIANTS = 5                 # 每組性格最多保留幾個版本
+MEMORY_CAPACITY = 32             # 行程內 LRU 最多保存幾組性格
+MAX_DISK_ROWS = 500              # 磁碟總版本數上限，超過時淘汰最舊者
+
+def cache_key(personalities):
+    return "|".join(sorted(set(personalities)))
+
+def is_complete_vault(vault, personalities):
+    # 只快取每個性格、每個屬性都有台詞的完整劇本，避免把殘缺結果長期保存
+    return bool(personalities) and all(
+        isinstance(vault.get(p), dict) and all(isinstance(vault[p].get(a), dict) and vault[p][a] for a in STAT_ATTRS)
+        for p in personalities
+    )
+
+class VaultCache:
+    def __init__(self, db_path=DEFAULT_DB_PATH, ttl=DEFAULT_TTL, max_variants=MAX_VARIANTS,
+                 memory_capacity=MEMORY_CAPACITY, max_disk_rows=MAX_DISK_ROWS):
+        self.db_path, self.ttl, self.max_variants = db_path, ttl, max_variants
+        self.memory_capacity, self.max_disk_rows = memory_capacity, max_disk_rows
+        self._memory = OrderedDict()   # key -> [(created_at, vault), ...]
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        if db_path:
+            if db_path != ":memory:": os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+            self._db.execute("CREATE TABLE IF NOT EXISTS vaults (id INTEGER PRIMARY KEY, cache_key TEXT NOT NULL, vault TEXT NOT NULL, created_at REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_vaults_key ON vaults (cache_key, created_at)")
+            self._db.commit()
+        else:
+            self._db = None
+
+    # ---------- 查詢 ----------
+    def get(self, personalities):
+        key = cache_key(personalities)
+        now = time.time()
+        with self._lock:
+            variants = [v for v in self._memory.get(key, []) if now - v[0] < self.ttl]
+            if variants:
+                self._memory[key] = variants
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return random.choice(variants)[1]
+
+            variants = self._load_disk(key, now)
+            if variants:
+                self._remember(key, variants)
+                self.stats["disk_hits"] += 1
+                return random.choice(variants)[1]
+
+            self.stats["misses"] += 1
+            return None
+
+    def variant_count(self, personalities):
+        key = cache_key(personalities)
+        with self._lock:
+            return len(self._load_disk(key, time.time())) if self._db else len(self._memory.get(key, []))
+
+    # ---------- 寫入 ----------
+    def put(self, personalities, vault):
+        if not is_complete_vault(vault, personalities): return False
+        key = cache_key(personalities)
+        now = time.time()
+        with self._lock:
+            if self._db:
+                self._db.execute("INSERT INTO vaults (cache_key, vault, created_at) VALUES (?, ?, ?)", (key, json.dumps(vault, ensure_ascii=False), now))
+                self._evict_disk(key, now)
+                self._db.commit()
+                variants = self._load_disk(key, now)
+            else:
+                variants = (self._memory.get(key, []) + [(now, vault)])[-self.max_variants:]
+            self._remember(key, variants)
+            self.stats["stores"] += 1
+        return True
+
+    def get_or_generate(self, personalities, generate):
+        vault = self.get(personalities)
+        if vault is not None: return vault
+        vault = generate(personalities)
+        self.put(personalities, vault)
+        return vault
+
+    # ---------- 內部 ----------
+    def _remember(self, key, variants):
+        self._memory[key] = variants
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_capacity: self._memory.popitem(last=False)
+
+    def _load_disk(self, key, now):
+        if not self._db: return []
+        try:
+            rows = self._db.execute("SELECT created_at, vault FROM vaults WHERE cache_key = ? AND created_at > ? ORDER BY created_at DESC LIMIT ?",
+                                    (key, now - self.ttl, self.max_variants)).fetchall()
+            return [(ts, json.loads(v)) for ts, v in reversed(rows)]
+        except (sqlite3.Error, ValueError) as e:
+            logging.error(f"台詞快取讀取失敗: {e}")
+            return []
+
+    def _evict_disk(self, key, now):
+        self._db.execute("DELETE FROM vaults WHERE created_at <= ?", (now - self.ttl,))
+        self._db.execute("DELETE FROM vaults WHERE cache_key = ? AND id NOT IN (SELECT id FROM vaults WHERE cache_key = ? ORDER BY created_at DESC LIMIT ?)",
+                         (key, key, self.max_variants))
+        self._db.execute("DELETE FROM vaults WHERE id NOT IN (SELECT id FROM vaults ORDER BY created_at DESC LIMIT ?)", (self.max_disk_rows,))
+
+    def disk_summary(self):
+        if not self._db: return {}
+        with self._lock:
+            return dict(self._db.execute("SELECT cache_key, COUNT(*) FROM vaults WHERE created_at > ? GROUP BY cache_key", (time.time() - self.ttl,)).fetchall())
+
+def prewarm(cache, generate, variants=3):
+    # 劇本以單一性格為單位生成與快取，逐一補足每個性格的版本數
+    generated = 0
+    for personality in AI_PERSONALITIES:
+        missing = variants - cache.variant_count([personality])
+        for _ in range(max(missing, 0)):
+            if cache.put([personality], generate(personality)): generated += 1
+            else: logging.warning(f"預熱 {personality} 取得不完整劇本，略過")
+    return generated
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="AI 台詞庫快取管理")
+    ap.add_argument("--db", default=DEFAULT_DB_PATH)
+    ap.add_argument("--prewarm", action="store_true", help="為每個 AI 性格各自生成台詞並寫入磁碟快取")
+    ap.add_argument("--variants", type=int, default=3, help="每個性格預熱的版本數")
+    ap.add_argument("--stats", action="store_true", help="列出磁碟快取內容")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - [SECURE_LOG] - %(message)s')
+    cache = VaultCache(args.db, max_variants=max(args.variants, MAX_VARIANTS))
+    if args.prewarm:
+        from ai_engine import generate_personality_vault
+        print(f"✅ 預熱完成，新增 {prewarm(cache, generate_personality_vault, args.variants)} 份劇本")
+    if args.stats or not args.prewarm:
+        for key, n in sorted(cache.disk_summary().items()): print(f"{key}: {n} 份")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())